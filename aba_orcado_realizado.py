@@ -19,6 +19,8 @@ from servico_orcado_realizado import (
     montar_realizado_analitico,
 )
 
+from servico_hierarquia import obter_arvore_contas
+
 MESES = list(MESES_NUMERO_NOME.values())
 
 
@@ -206,21 +208,12 @@ def _filtrar_classificacao(
         .str.strip()
     )
 
-    contas = resultado["Conta"].tolist()
-
-    def eh_folha(conta):
-        prefixo = str(conta).strip() + "."
-
-        return not any(
-            str(outra).startswith(prefixo)
-            for outra in contas
-            if str(outra) != str(conta)
-        )
-
-    resultado["_EhFolha"] = (
-        resultado["Conta"]
-        .apply(eh_folha)
-    )
+    # Folhas vêm da árvore compilada do plano, guardada em
+    # cache por versão: uma passada linear em vez de comparar
+    # cada conta com todas as outras.
+    resultado["_EhFolha"] = obter_arvore_contas(
+        resultado
+    ).eh_folha
 
     colunas_valores = [
         coluna
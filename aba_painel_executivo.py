@@ -2,13 +2,7 @@ import streamlit as st
 import pandas as pd
 
 from servico_controladoria import (
-    calcular_resumo_financeiro,
-    calcular_receita_mensal,
-    calcular_resultado_mensal,
-    calcular_margem_mensal,
-    top_contas_despesa,
-    top_contas_receita,
-    gerar_alertas_financeiros,
+    ControladoriaSnapshot,
     calcular_resultado_por_centro_custo,
     ranking_melhores_obras,
     ranking_piores_obras,
@@ -38,11 +32,13 @@ def render_aba_painel_executivo(
         st.warning("Sem dados.")
         return
 
-    resumo = calcular_resumo_financeiro(
+    snapshot = ControladoriaSnapshot(
         df_bi,
         meses_sel
     )
 
+    resumo = snapshot.resumo
+
     col1,col2,col3,col4 = st.columns(4)
 
     col1.metric(
@@ -69,10 +65,7 @@ def render_aba_painel_executivo(
 
     st.subheader("Receita Mensal")
 
-    receita = calcular_receita_mensal(
-        df_bi,
-        meses_sel
-    )
+    receita = snapshot.receita_mensal
 
     if not receita.empty:
         receita = receita.set_index("Mês")
@@ -80,10 +73,7 @@ def render_aba_painel_executivo(
 
     st.subheader("Resultado Mensal")
 
-    resultado = calcular_resultado_mensal(
-        df_bi,
-        meses_sel
-    )
+    resultado = snapshot.resultado_mensal
 
     if not resultado.empty:
         resultado = resultado.set_index("Mês")
@@ -91,10 +81,7 @@ def render_aba_painel_executivo(
 
     st.subheader("Margem Mensal")
 
-    margem = calcular_margem_mensal(
-        df_bi,
-        meses_sel
-    )
+    margem = snapshot.margem_mensal
 
     if not margem.empty:
         margem = margem.set_index("Mês")
@@ -108,11 +95,7 @@ def render_aba_painel_executivo(
 
         st.subheader("Top Receitas")
 
-        top = top_contas_receita(
-            df_bi,
-            meses_sel,
-            10
-        )
+        top = snapshot.top_contas_receita(10)
 
         if not top.empty:
             st.dataframe(
@@ -130,11 +113,7 @@ def render_aba_painel_executivo(
 
         st.subheader("Top Despesas")
 
-        top = top_contas_despesa(
-            df_bi,
-            meses_sel,
-            10
-        )
+        top = snapshot.top_contas_despesa(10)
 
         if not top.empty:
             st.dataframe(
@@ -152,10 +131,7 @@ def render_aba_painel_executivo(
 
     st.subheader("Radar do Diretor")
 
-    alertas = gerar_alertas_financeiros(
-        df_bi,
-        meses_sel
-    )
+    alertas = snapshot.alertas
 
     if len(alertas)==0:
 
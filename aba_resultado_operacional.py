@@ -3,6 +3,12 @@ import io
 import pandas as pd
 import streamlit as st
 
+from servico_hierarquia import (
+    classificar_contas,
+    consolidar_valores_plano,
+    lancar_movimentos_no_plano,
+)
+
 
 def render_aba_resultado_operacional(
     ano_sel,
@@ -62,30 +68,13 @@ def render_aba_resultado_operacional(
         .str.strip()
     )
 
-    mapa_class = dict(zip(df_base["Conta"], df_base["Classificacao"]))
-
     df_mov["Conta_ID"] = df_mov["Conta_ID"].astype(str).str.strip()
     df_mov["Valor_Final"] = pd.to_numeric(
         df_mov["Valor_Final"],
         errors="coerce"
     ).fillna(0.0)
 
-    def classificar_movimento(conta):
-        conta = str(conta).strip()
-
-        if conta in mapa_class:
-            return mapa_class[conta]
-
-        partes = conta.split(".")
-        while len(partes) > 1:
-            partes = partes[:-1]
-            pai = ".".join(partes)
-            if pai in mapa_class:
-                return mapa_class[pai]
-
-        return "operacional"
-
-    df_mov["Classificacao"] = df_mov["Conta_ID"].apply(classificar_movimento)
+    df_mov["Classificacao"] = classificar_contas(df_mov["Conta_ID"], df_base)
 
     if filtro_classificacao != "todos":
         df_mov = df_mov[
@@ -97,41 +86,18 @@ def render_aba_resultado_operacional(
             df_mov["Centro de Custo"].isin(cc_sel)
         ].copy()
 
-    for mes in meses_sel:
-        df_base[mes] = 0.0
-
-    for mes in meses_sel:
-        mes_num = int(MAPA_MESES[mes])
-        df_m = df_mov[
-            df_mov["Mes"].astype(int) == mes_num
-        ].copy()
-
-        if df_m.empty:
-            continue
-
-        mapa_valores = df_m.groupby("Conta_ID")["Valor_Final"].sum().to_dict()
-        df_base[mes] = df_base["Conta"].map(mapa_valores).fillna(0.0)
-
-        for n in sorted(df_base["Nivel"].dropna().unique(), reverse=True):
-            if n <= 1:
-                continue
-
-            nivel_pai = n - 1
-
-            for idx, row in df_base[df_base["Nivel"] == nivel_pai].iterrows():
-                pref = str(row["Conta"]).strip() + "."
-                filhos = df_base[
-                    (df_base["Nivel"] == n)
-                    & (df_base["Conta"].astype(str).str.startswith(pref))
-                ]
-
-                total_filhos = filhos[mes].sum()
-
-                if total_filhos != 0:
-                    df_base.at[idx, mes] = total_filhos
+    df_base = lancar_movimentos_no_plano(
+        df_base,
+        df_mov,
+        {int(MAPA_MESES[mes]): mes for mes in meses_sel}
+    )
 
-        for idx, _ in df_base[df_base["Nivel"] == 1].iterrows():
-            df_base.at[idx, mes] = df_base[df_base["Nivel"] == 2][mes].sum()
+    # O total das filhas substitui o valor da conta-mãe.
+    df_base = consolidar_valores_plano(
+        df_base,
+        meses_sel,
+        somar_lancamento_direto=False
+    )
 
     df_base["ACUMULADO"] = df_base[meses_sel].sum(axis=1)
     df_base["MÉDIA"] = df_base[meses_sel].mean(axis=1)
@@ -11,6 +11,8 @@ import time
 from datetime import datetime
 import calendar
 
+from servico_hierarquia import filtrar_linhas_zeradas, normalizar_codigos_conta
+
 def mostrar_erro(contexto, erro):
     st.error(f"❌ {contexto}: {type(erro).__name__} - {erro}")
 
@@ -75,25 +77,6 @@ def abrir_planilha(key):
 spreadsheet = abrir_planilha("1qNqW6ybPR1Ge9TqJvB7hYJVLst8RDYce40ZEsMPoe4Q")
 if not spreadsheet: st.stop()
 
-# --- FUNÇÃO DE LIMPEZA DE CONTA (PRESERVAÇÃO DO .10) ---
-def limpar_conta_blindado(valor, nivel):
-    v = str(valor).strip()
-    if '/' in v or '-' in v: 
-        v = v.replace('/', '.').replace('-', '.')
-        partes = v.split('.')
-        if len(partes) >= 3:
-            ano_corrigido = "001" if "2001" in partes[2] else partes[2][-3:]
-            return f"{partes[1].zfill(2)}.{partes[0].zfill(2)}.{ano_corrigido}"
-    
-    if nivel == 3 and '.' in v:
-        p = v.split('.')
-        p0, p1 = p[0].zfill(2), p[1]
-        v = f"{p0}.{p1}0" if len(p1) == 1 else f"{p0}.{p1}"
-            
-    if nivel in [2, 3] and not v.startswith('0') and (len(v) == 1 or ('.' in v and len(v.split('.')[0]) == 1)):
-        v = '0' + v
-    return v
-
 def formatar_moeda_br(val):
     if not isinstance(val, (int, float)): return val
     valor_abs = abs(val)
@@ -104,16 +87,6 @@ def formatar_pct(val):
     if not isinstance(val, (int, float)): return val
     return f"{val:.1f}%"
 
-def filtrar_linhas_zeradas(df, colunas_valores):
-    df = df.copy()
-    df['zerado'] = df[colunas_valores].abs().sum(axis=1) == 0
-    remover_indices = set(df[(df['Nivel'] == 4) & (df['zerado'])].index)
-    for idx, row in df[df['Nivel'] == 3].iterrows():
-        prefix = str(row['Conta']).strip() + "."
-        filhos = df[(df['Nivel'] == 4) & (df['Conta'].str.startswith(prefix))]
-        if not filhos.empty and filhos['zerado'].all(): remover_indices.add(idx)
-    return df.drop(index=list(remover_indices)).drop(columns=['zerado'])
-
 @st.cache_data(ttl=3600)
 def listar_abas_existentes():
     abas = ["Base", "Rateio"]
@@ -322,10 +295,7 @@ def processar_bi(ano, meses, filtros_cc):
     df_base = df_base.dropna(subset=['Nivel']).copy()
     df_base['Nivel'] = df_base['Nivel'].astype(int)
 
-    df_base['Conta'] = df_base.apply(
-        lambda x: limpar_conta_blindado(x['Conta'], x['Nivel']),
-        axis=1
-    ).astype(str)
+    df_base['Conta'] = normalizar_codigos_conta(df_base['Conta'], df_base['Nivel']).astype(str)
 
     for m in meses:
         try:
@@ -708,7 +678,7 @@ with aba5:
             df_base_c = df_base_c.rename(columns={df_base_c.columns[0]: 'Conta', df_base_c.columns[1]: 'Descrição', df_base_c.columns[2]: 'Nivel'})
             
             # BLINDAGEM DE HIERARQUIA: Garante que 1.01 vire 01.01 para somar os filhos
-            df_base_c['Conta'] = df_base_c.apply(lambda x: limpar_conta_blindado(x['Conta'], x['Nivel']), axis=1).astype(str).str.strip()
+            df_base_c['Conta'] = normalizar_codigos_conta(df_base_c['Conta'], df_base_c['Nivel']).astype(str).str.strip()
             
             def calc_soberano(anos_alvo, meses_alvo):
                 map_res = {}
@@ -826,10 +796,7 @@ with aba6:
             df_base_alert = df_base_alert.dropna(subset=['Nivel']).copy()
             df_base_alert['Nivel'] = df_base_alert['Nivel'].astype(int)
 
-            df_base_alert['Conta'] = df_base_alert.apply(
-                lambda x: limpar_conta_blindado(x['Conta'], x['Nivel']),
-                axis=1
-            ).astype(str)
+            df_base_alert['Conta'] = normalizar_codigos_conta(df_base_alert['Conta'], df_base_alert['Nivel']).astype(str)
             
             def get_vals_alert(lista):
                 mv = {}
@@ -1124,10 +1091,7 @@ with aba9:
             df_base_comp = df_base_comp.dropna(subset=['Nivel']).copy()
             df_base_comp['Nivel'] = df_base_comp['Nivel'].astype(int)
 
-            df_base_comp['Conta'] = df_base_comp.apply(
-                lambda x: limpar_conta_blindado(x['Conta'], x['Nivel']),
-                axis=1
-            ).astype(str).str.strip()
+            df_base_comp['Conta'] = normalizar_codigos_conta(df_base_comp['Conta'], df_base_comp['Nivel']).astype(str).str.strip()
 
             mapa_desc = dict(zip(df_base_comp['Conta'], df_base_comp['Descrição']))
 
@@ -3,8 +3,6 @@
 
 import io
 import hmac
-import calendar
-from datetime import datetime
 
 import pandas as pd
 import plotly.express as px
@@ -16,6 +14,43 @@ from aba_resultado_operacional import render_aba_resultado_operacional
 from aba_orcamento_obz import render_aba_orcamento_obz
 from aba_orcado_realizado import render_aba_orcado_realizado
 from aba_painel_executivo import render_aba_painel_executivo
+from servico_agregacao import agregar_movimentos, buscar_agregados
+from servico_busca_supabase import buscar_todos_keyset
+from servico_cache_movimentos import invalidar_particao, ler_movimentos_com_cache
+from servico_carga_movimentos import (
+    gerar_lotes_movimentos,
+    importar_periodos_movimentos,
+    juntar_lotes_movimentos,
+    periodos_parciais,
+    separar_por_periodo,
+)
+from servico_cubo_financeiro import (
+    carregar_cubo_periodo,
+    fatiar_cubo,
+    montar_cubo,
+    registrar_periodo_cubo,
+    somar_cubo,
+)
+from servico_cache_dependencias import CacheLRU, invalidar_dependencia, versao_dependencias
+from servico_esquemas import aplicar_esquema, colunas_select, erro_coluna_ausente
+from servico_validacao_importacao import ReferenciaImportacao
+from servico_hierarquia import (
+    consolidar_valores_plano,
+    filtrar_linhas_zeradas,
+    lancar_movimentos_no_plano,
+    normalizar_plano_contas,
+)
+from servico_indice_movimentos import (
+    carregar_indice,
+    listar_centros_custo,
+    montar_indice,
+    normalizar_indice,
+    reconstruir_indice,
+    registrar_periodo,
+    resumir_periodo,
+)
+from servico_controladoria import comparar_cenarios_rateio
+from servico_rateio import calcular_resultado_centros, distribuir_proporcionalmente
 
 # =========================
 # CONFIGURAÇÃO GERAL
@@ -195,28 +230,6 @@ supabase_client = get_supabase_client()
 # =========================
 # FUNÇÕES UTILITÁRIAS
 # =========================
-def limpar_conta_blindado(valor, nivel):
-    v = str(valor).strip()
-
-    if "/" in v or "-" in v:
-        v = v.replace("/", ".").replace("-", ".")
-        partes = v.split(".")
-        if len(partes) >= 3:
-            ano_corrigido = "001" if "2001" in partes[2] else partes[2][-3:]
-            return f"{partes[1].zfill(2)}.{partes[0].zfill(2)}.{ano_corrigido}"
-
-    if nivel == 3 and "." in v:
-        p = v.split(".")
-        if len(p) >= 2:
-            p0, p1 = p[0].zfill(2), p[1]
-            v = f"{p0}.{p1}0" if len(p1) == 1 else f"{p0}.{p1}"
-
-    if nivel in [2, 3] and not v.startswith("0") and (len(v) == 1 or ("." in v and len(v.split(".")[0]) == 1)):
-        v = "0" + v
-
-    return v
-
-
 def formatar_moeda_br(val):
     try:
         val = float(val)
@@ -235,57 +248,23 @@ def formatar_pct(val):
         return val
 
 
-def filtrar_linhas_zeradas(df, colunas_valores):
-    df = df.copy()
-    colunas_validas = [c for c in colunas_valores if c in df.columns]
-
-    if not colunas_validas:
-        return df
-
-    df["zerado"] = df[colunas_validas].abs().sum(axis=1) == 0
-    remover_indices = set(df[(df["Nivel"] == 4) & (df["zerado"])].index)
-
-    for idx, row in df[df["Nivel"] == 3].iterrows():
-        prefix = str(row["Conta"]).strip() + "."
-        filhos = df[(df["Nivel"] == 4) & (df["Conta"].astype(str).str.startswith(prefix))]
-        if not filhos.empty and filhos["zerado"].all():
-            remover_indices.add(idx)
+def supabase_fetch_all(table_name, columns="*", tamanho_pagina=1000):
+    """Busca todos os registros paginando por id (keyset), de 1000 em 1000."""
+    if columns != "*" and "id" not in [c.strip() for c in columns.split(",")]:
+        columns = f"{columns},id"
 
-    return df.drop(index=list(remover_indices)).drop(columns=["zerado"])
-
-
-def supabase_fetch_all(table_name, columns="*"):
-    """Busca todos os registros paginando de 1000 em 1000."""
-    todos = []
-    inicio = 0
-    passo = 1000
-
-    while True:
-        resposta = (
-            supabase_client
-            .table(table_name)
-            .select(columns)
-            .range(inicio, inicio + passo - 1)
-            .execute()
-        )
-        lote = resposta.data or []
-        todos.extend(lote)
-
-        if len(lote) < passo:
-            break
-
-        inicio += passo
-
-    return todos
+    return buscar_todos_keyset(
+        lambda: supabase_client.table(table_name).select(columns),
+        tamanho_pagina=tamanho_pagina
+    )
 
 
 def normalizar_movimentos(df):
-    """Converte nomes do Supabase para o padrão interno antigo do app."""
+    """Converte nomes e tipos do Supabase para o padrão interno antigo do app."""
     if df.empty:
         return df
 
-    df = df.copy()
-    df.columns = [str(c).strip().lower() for c in df.columns]
+    df = aplicar_esquema(df, "movimentos_financeiros")
 
     rename_map = {
         "data": "Data",
@@ -295,24 +274,7 @@ def normalizar_movimentos(df):
         "centro_custo": "Centro de Custo",
         "valor": "Valor_Final",
     }
-    df = df.rename(columns=rename_map)
-
-    if "Valor_Final" in df.columns:
-        df["Valor_Final"] = pd.to_numeric(df["Valor_Final"], errors="coerce").fillna(0.0)
-
-    if "Conta_ID" in df.columns:
-        df["Conta_ID"] = df["Conta_ID"].astype(str).str.strip()
-
-    if "Centro de Custo" in df.columns:
-        df["Centro de Custo"] = df["Centro de Custo"].astype(str).str.strip()
-
-    if "Mes" in df.columns:
-        df["Mes"] = pd.to_numeric(df["Mes"], errors="coerce").astype("Int64")
-
-    if "Ano" in df.columns:
-        df["Ano"] = pd.to_numeric(df["Ano"], errors="coerce").astype("Int64")
-
-    return df
+    return df.rename(columns=rename_map)
 
 
 def montar_abas_existentes_supabase(df_mov):
@@ -336,16 +298,19 @@ def montar_abas_existentes_supabase(df_mov):
 # =========================
 # LEITURAS SUPABASE
 # =========================
-@st.cache_data(ttl=600)
 def carregar_aba_base():
+    return _carregar_aba_base(versao_dependencias("plano_contas"))
+
+
+@st.cache_data(ttl=600)
+def _carregar_aba_base(versao_cache):
     try:
-        dados = supabase_fetch_all("plano_contas")
-        df = pd.DataFrame(dados)
+        dados = supabase_fetch_all("plano_contas", colunas_select("plano_contas"))
+        df = aplicar_esquema(dados, "plano_contas")
 
         if df.empty:
             return pd.DataFrame()
 
-        df.columns = [str(c).lower().strip() for c in df.columns]
         df = df.rename(columns={
             "conta_id": "Conta",
             "descricao": "Descrição",
@@ -359,42 +324,42 @@ def carregar_aba_base():
             st.error(f"❌ plano_contas sem colunas esperadas: {faltantes}")
             return pd.DataFrame()
 
-        df = df[colunas].copy()
-        df["Nivel"] = pd.to_numeric(df["Nivel"], errors="coerce")
-        df = df.dropna(subset=["Conta", "Nivel"]).copy()
-        df["Nivel"] = df["Nivel"].astype(int)
-        df["Conta"] = df.apply(lambda x: limpar_conta_blindado(x["Conta"], x["Nivel"]), axis=1).astype(str).str.strip()
-        def chave_ordem_conta(conta):
-                    partes = str(conta).split(".")
-                    return tuple(int(p) if p.isdigit() else 0 for p in partes)
-        
-        df["ordem_conta"] = df["Conta"].apply(chave_ordem_conta)
-        df = df.sort_values(by="ordem_conta").drop(columns=["ordem_conta"]).reset_index(drop=True)
-        df["Classificacao"] = (
-            df["Classificacao"]
-            .fillna("operacional")
-            .astype(str)
-            .str.lower()
-            .str.strip()
-        )
-
-        return df
+        return normalizar_plano_contas(df[colunas])
 
     except Exception as e:
         mostrar_erro("Erro ao ler plano_contas no Supabase", e)
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=600)
+def buscar_rateio_config():
+    """
+    Lê o rateio_config. Em bancos sem a coluna peso (alter table de
+    servico_rateio ainda não aplicado), lê sem ela em vez de falhar.
+    """
+    try:
+        return supabase_fetch_all("rateio_config", colunas_select("rateio_config"))
+    except Exception as e:
+        if not erro_coluna_ausente(e):
+            raise
+
+        return supabase_fetch_all(
+            "rateio_config",
+            colunas_select("rateio_config", opcionais=False)
+        )
+
+
 def carregar_logica_rateio():
+    return _carregar_logica_rateio(versao_dependencias("rateio_config"))
+
+
+@st.cache_data(ttl=600)
+def _carregar_logica_rateio(versao_cache):
     try:
-        dados = supabase_fetch_all("rateio_config")
-        df = pd.DataFrame(dados)
+        df = aplicar_esquema(buscar_rateio_config(), "rateio_config")
 
         if df.empty:
             return pd.DataFrame()
 
-        df.columns = [str(c).lower().strip() for c in df.columns]
         df = df.rename(columns={
             "centro_custo": "Centro de Custo",
             "logica": "Logica"
@@ -406,7 +371,11 @@ def carregar_logica_rateio():
             st.error(f"❌ rateio_config sem colunas esperadas: {faltantes}")
             return pd.DataFrame()
 
-        df = df[colunas].copy()
+        # Peso alimenta o driver "peso" do rateio (servico_rateio).
+        if "peso" in df.columns:
+            colunas.append("peso")
+
+        df = df[colunas].rename(columns={"peso": "Peso"}).copy()
         df["Logica"] = df["Logica"].astype(str).str.lower().str.strip()
         df["Centro de Custo"] = df["Centro de Custo"].astype(str).str.strip()
         df = df[df["Logica"].isin(["obra", "rateio", "fora"])]
@@ -419,43 +388,48 @@ def carregar_logica_rateio():
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=600)
-def carregar_movimentos_periodo(ano, meses_numeros):
+def buscar_movimentos_mes_supabase(ano, mes_num):
     """
-    Lê movimentos do Supabase paginando de 1000 em 1000.
+    Lê um mês de movimentos do Supabase paginando de 1000 em 1000 por id.
     Importante: o Supabase/PostgREST costuma limitar retorno por página.
     Sem paginação, o app lê só parte do mês e os totais ficam muito abaixo.
+    Os meses são buscados em paralelo; cada página tem nova tentativa em caso de erro.
     """
-    try:
-        if not meses_numeros:
-            return pd.DataFrame()
+    def montar_consulta():
+        return (
+            supabase_client
+            .table("movimentos_financeiros")
+            .select(colunas_select("movimentos_financeiros"))
+            .eq("ano", int(ano))
+            .eq("mes", str(int(mes_num)))
+        )
 
-        dados = []
-        passo = 1000
-
-        for mes_num in meses_numeros:
-            inicio = 0
-
-            while True:
-                resposta = (
-                    supabase_client
-                    .table("movimentos_financeiros")
-                    .select("*")
-                    .eq("ano", int(ano))
-                    .eq("mes", str(int(mes_num)))
-                    .range(inicio, inicio + passo - 1)
-                    .execute()
-                )
+    return pd.DataFrame(buscar_todos_keyset(montar_consulta))
 
-                lote = resposta.data or []
-                dados.extend(lote)
 
-                if len(lote) < passo:
-                    break
+def carregar_movimentos_periodo(ano, meses_numeros):
+    return _carregar_movimentos_periodo(
+        ano,
+        meses_numeros,
+        versao_dependencias("movimentos_financeiros", [(ano, m) for m in meses_numeros])
+    )
 
-                inicio += passo
 
-        df = pd.DataFrame(dados)
+@st.cache_data(ttl=600)
+def _carregar_movimentos_periodo(ano, meses_numeros, versao_cache):
+    """
+    Lê movimentos do cache local em Parquet (uma partição por ano/mês).
+    Só os meses ainda não gravados em disco são buscados no Supabase.
+    """
+    try:
+        if not meses_numeros:
+            return pd.DataFrame()
+
+        df = ler_movimentos_com_cache(
+            ano,
+            meses_numeros,
+            buscar_movimentos_mes_supabase
+        )
         return normalizar_movimentos(df)
 
     except Exception as e:
@@ -463,7 +437,63 @@ def carregar_movimentos_periodo(ano, meses_numeros):
         return pd.DataFrame()
 
 
+def carregar_movimentos_agregados(ano, meses_numeros):
+    return _carregar_movimentos_agregados(
+        ano,
+        meses_numeros,
+        versao_dependencias("movimentos_agregados", [(ano, m) for m in meses_numeros])
+    )
+
+
+@st.cache_data(ttl=600)
+def _carregar_movimentos_agregados(ano, meses_numeros, versao_cache):
+    """
+    Lê da view movimentos_agregados as somas por ano, mês, conta e
+    centro de custo. Se a view não estiver disponível, agrega localmente.
+    """
+    try:
+        return buscar_agregados(supabase_client, ano, meses_numeros)
+    except Exception as e:
+        st.warning(f"⚠️ Agregação no servidor indisponível, usando cálculo local: {type(e).__name__}")
+        return agregar_movimentos(carregar_movimentos_periodo(ano, meses_numeros))
+
+
+def carregar_cubo_movimentos(ano, meses_numeros):
+    return _carregar_cubo_movimentos(
+        ano,
+        meses_numeros,
+        versao_dependencias("movimentos_cubo", [(ano, m) for m in meses_numeros])
+    )
+
+
 @st.cache_data(ttl=600)
+def _carregar_cubo_movimentos(ano, meses_numeros, versao_cache):
+    """
+    Lê o cubo (ano × mês × conta × centro de custo) já somado.
+    Meses ainda fora do cubo são montados a partir dos lançamentos e gravados.
+    """
+    try:
+        return carregar_cubo_periodo(
+            supabase_client,
+            ano,
+            meses_numeros,
+            carregar_movimentos_periodo
+        )
+    except Exception as e:
+        mostrar_erro("Erro ao ler movimentos_cubo no Supabase", e)
+        return montar_cubo(None)
+
+
+def carregar_movimentos_relatorio(ano, meses_numeros):
+    """
+    Fonte de movimentos dos relatórios: somas agrupadas pela view do banco
+    quando a agregação no servidor está ativa, o cubo materializado caso contrário.
+    """
+    if st.session_state.get("agregacao_servidor", False):
+        return carregar_movimentos_agregados(ano, meses_numeros)
+    return carregar_cubo_movimentos(ano, meses_numeros)
+
+
 def carregar_aba_mensal(nome_aba):
     try:
         mes_nome, ano_txt = nome_aba.split("_")
@@ -474,10 +504,14 @@ def carregar_aba_mensal(nome_aba):
         return pd.DataFrame()
 
 
-@st.cache_data(ttl=600)
 def carregar_todos_movimentos():
+    return _carregar_todos_movimentos(versao_dependencias("movimentos_financeiros"))
+
+
+@st.cache_data(ttl=600)
+def _carregar_todos_movimentos(versao_cache):
     try:
-        dados = supabase_fetch_all("movimentos_financeiros")
+        dados = supabase_fetch_all("movimentos_financeiros", colunas_select("movimentos_financeiros"))
         df = pd.DataFrame(dados)
         return normalizar_movimentos(df)
     except Exception as e:
@@ -485,34 +519,43 @@ def carregar_todos_movimentos():
         return pd.DataFrame()
 
 
-def obter_centros_custo(df_mov):
-    if df_mov.empty or "Centro de Custo" not in df_mov.columns:
-        return []
-    return sorted([c for c in df_mov["Centro de Custo"].dropna().astype(str).unique().tolist() if c.strip()])
-    
-def cadastrar_centros_custo_automaticamente(df_mov_supabase):
-    df_rateio = carregar_logica_rateio()
+def carregar_indice_movimentos():
+    return _carregar_indice_movimentos(versao_dependencias("movimentos_indice"))
 
-    centros_existentes = set()
 
-    if not df_rateio.empty:
-        centros_existentes = set(
-            df_rateio["Centro de Custo"]
-            .astype(str)
-            .str.strip()
-        )
+@st.cache_data(ttl=600)
+def _carregar_indice_movimentos(versao_cache):
+    """
+    Períodos (ano/mês), centros de custo e quantidade de linhas
+    de movimentos_financeiros, lidos do índice leve em uma única consulta.
+    Se o índice ainda não existir, é montado uma vez a partir dos movimentos.
+    """
+    try:
+        df_indice = carregar_indice(supabase_client)
+    except Exception:
+        return normalizar_indice(montar_indice(carregar_todos_movimentos()))
 
-    centros_importados = sorted(
-        set(
-            df_mov_supabase["centro_custo"]
-            .astype(str)
-            .str.strip()
-        ) - centros_existentes
-    )
+    if df_indice.empty:
+        try:
+            df_indice = reconstruir_indice(supabase_client, carregar_todos_movimentos())
+        except Exception as e:
+            mostrar_erro("Erro ao reconstruir movimentos_indice no Supabase", e)
+
+    return df_indice
+
+
+def obter_centros_custo(df_indice):
+    return listar_centros_custo(df_indice)
+
+    
+def cadastrar_centros_custo_automaticamente(df_mov_supabase, referencia=None):
+    if referencia is None:
+        referencia = ReferenciaImportacao(df_rateio=carregar_logica_rateio())
 
+    # Célula vazia chega como "" e nunca vira um centro de custo.
     centros_importados = [
-        c for c in centros_importados
-        if c and c.lower() != "nan"
+        str(c).strip() for c in referencia.centros_faltantes(df_mov_supabase)["centro_custo"]
+        if str(c).strip() and str(c).strip().lower() not in ("nan", "none")
     ]
 
     if not centros_importados:
@@ -533,73 +576,80 @@ def cadastrar_centros_custo_automaticamente(df_mov_supabase):
             novos_registros[i:i + tamanho_lote]
         ).execute()
 
-    st.cache_data.clear()
+    invalidar_dependencia("rateio_config")
+    referencia.registrar_centros(centros_importados)
 
     return centros_importados
 # =========================
 # PROCESSAMENTO PRINCIPAL
 # =========================
-def processar_bi(ano, meses, filtros_cc):
-    if not meses:
-        return None, []
+LIMITE_RESULTADOS_BI = 32
 
-    df_base = carregar_aba_base().copy()
+_cache_processar_bi = CacheLRU(LIMITE_RESULTADOS_BI, ttl_segundos=600)
 
-    if df_base.empty:
-        st.warning("Plano de contas não encontrado no Supabase.")
-        return None, []
 
-    meses_numeros = [MAPA_MESES[m] for m in meses if m in MAPA_MESES]
-    df_mov = carregar_movimentos_periodo(ano, meses_numeros)
+def processar_bi(ano, meses, filtros_cc):
+    """
+    DRE consolidada do período, reaproveitada entre abas e reruns
+    enquanto plano de contas e movimentos do período não mudarem.
+    """
+    if not meses:
+        return None, []
 
-    for m in meses:
-        df_base[m] = 0.0
+    meses = [m for m in meses if m in MAPA_MESES]
+    meses_numeros = [MAPA_MESES[m] for m in meses]
+    filtros = tuple(sorted({str(c) for c in (filtros_cc or [])}))
+    if not filtros or "Todos" in filtros:
+        filtros = ("Todos",)
+
+    fonte = "movimentos_agregados" if st.session_state.get("agregacao_servidor", False) else "movimentos_cubo"
+    chave = (
+        int(ano),
+        tuple(meses),
+        filtros,
+        fonte,
+        versao_dependencias(fonte, [(ano, m) for m in meses_numeros]),
+        versao_dependencias("plano_contas"),
+    )
 
-    if not df_mov.empty:
-        if "Todos" not in filtros_cc and filtros_cc:
-            df_mov = df_mov[df_mov["Centro de Custo"].isin(filtros_cc)]
+    resultado = _cache_processar_bi.obter(chave)
+    if resultado is None:
+        resultado = _processar_bi(ano, meses, list(filtros))
+        if resultado[0] is not None:
+            _cache_processar_bi.guardar(chave, resultado)
 
-        for m in meses:
-            mes_num = MAPA_MESES[m]
-            df_m = df_mov[df_mov["Mes"] == mes_num].copy()
+    df_base, meses_exibir = resultado
+    if df_base is None:
+        return None, []
+    return df_base.copy(), list(meses_exibir)
 
-            if df_m.empty:
-                continue
 
-            df_m["Conta_ID"] = df_m["Conta_ID"].astype(str).str.strip()
-            mapeamento = df_m.groupby("Conta_ID")["Valor_Final"].sum().to_dict()
+def _processar_bi(ano, meses, filtros_cc):
+    if not meses:
+        return None, []
 
-            # Zera o mês
-            df_base[m] = 0.0
+    df_base = carregar_aba_base().copy()
 
-            # 1) Primeiro joga valor exatamente no nível que existir
-            df_base[m] = df_base["Conta"].map(mapeamento).fillna(0.0)
+    if df_base.empty:
+        st.warning("Plano de contas não encontrado no Supabase.")
+        return None, []
 
-            # 2) Soma níveis superiores de baixo para cima: 5 -> 4 -> 3 -> 2
-            niveis_existentes = sorted(df_base["Nivel"].dropna().unique(), reverse=True)
+    meses_numeros = [MAPA_MESES[m] for m in meses if m in MAPA_MESES]
+    df_mov = carregar_movimentos_relatorio(ano, meses_numeros)
 
-            for n in niveis_existentes:
-                if n <= 1:
-                    continue
+    if not df_mov.empty and "Todos" not in filtros_cc and filtros_cc:
+        df_mov = fatiar_cubo(df_mov, centros_custo=filtros_cc)
 
-                nivel_pai = n - 1
+    # 1) Joga o valor de cada mês exatamente no nível que existir
+    df_base = lancar_movimentos_no_plano(
+        df_base,
+        df_mov,
+        {MAPA_MESES[m]: m for m in meses}
+    )
 
-                for idx, row in df_base[df_base["Nivel"] == nivel_pai].iterrows():
-                    pref = str(row["Conta"]).strip() + "."
-                    total_filhos = df_base[
-                        (df_base["Nivel"] == n) &
-                        (df_base["Conta"].astype(str).str.startswith(pref))
-                    ][m].sum()
-                    
-                    # Preserva eventual lançamento direto feito na conta-mãe
-                    # e soma os valores das contas-filhas.
-                    if total_filhos != 0:
-                        valor_direto_pai = df_base.at[idx, m]
-                        df_base.at[idx, m] = valor_direto_pai + total_filhos
-                    
-            # 3) Nível 1 soma os níveis 2
-            for idx, _ in df_base[df_base["Nivel"] == 1].iterrows():
-                df_base.at[idx, m] = df_base[df_base["Nivel"] == 2][m].sum()
+    # 2) Soma níveis superiores de baixo para cima, preservando
+    # eventual lançamento direto feito na conta-mãe.
+    df_base = consolidar_valores_plano(df_base, meses)
 
     df_base["ACUMULADO"] = df_base[meses].sum(axis=1)
     df_base["MÉDIA"] = df_base[meses].mean(axis=1)
@@ -621,10 +671,11 @@ def gerar_dados_pizza(df, nivel, limite=10):
 
 
 def obter_movimentos_por_anos_meses(anos, meses):
+    meses_num = [MAPA_MESES[m] for m in meses if m in MAPA_MESES]
+
     lista = []
     for ano in anos:
-        meses_num = [MAPA_MESES[m] for m in meses if m in MAPA_MESES]
-        df = carregar_movimentos_periodo(int(ano), meses_num)
+        df = carregar_movimentos_relatorio(int(ano), meses_num)
         if not df.empty:
             lista.append(df)
     return pd.concat(lista, ignore_index=True) if lista else pd.DataFrame()
@@ -632,72 +683,116 @@ def obter_movimentos_por_anos_meses(anos, meses):
 # =========================
 # CARGA EXCEL -> SUPABASE
 # =========================
-def preparar_movimentos_para_supabase(df_carga, ano_ref, mes_ref_nome):
-    df = df_carga.copy()
-    df.columns = [str(c).strip() for c in df.columns]
-
-    obrigatorias = ["Data Baixa", "Valor Baixado", "Pag/Rec", "C. Resultado", "Centro de Custo"]
-    faltantes = [c for c in obrigatorias if c not in df.columns]
-    if faltantes:
-        raise ValueError(f"Colunas obrigatórias ausentes no Excel: {faltantes}")
-
-    mes_num = MAPA_MESES[mes_ref_nome]
-    data_inicio = datetime(int(ano_ref), mes_num, 1)
-    data_fim = datetime(int(ano_ref), mes_num, calendar.monthrange(int(ano_ref), mes_num)[1])
-
-    df["Data Baixa"] = pd.to_datetime(df["Data Baixa"], errors="coerce")
-    fora = df[(df["Data Baixa"] < data_inicio) | (df["Data Baixa"] > data_fim) | (df["Data Baixa"].isna())]
-    if not fora.empty:
-        raise ValueError(f"Carga abortada: existem {len(fora)} linhas fora de {mes_ref_nome}/{ano_ref} pela Data Baixa.")
-
-    if "Histórico" in df.columns:
-        df = df[~df["Histórico"].astype(str).str.contains("baixa vinculo", case=False, na=False)].copy()
-
-    df["valor"] = df.apply(
-        lambda x: float(x["Valor Baixado"]) * -1 if str(x["Pag/Rec"]).strip().upper() == "P" else float(x["Valor Baixado"]),
-        axis=1
-    )
+def carregar_referencia_importacao():
+    """Plano e rateio lidos uma vez e reaproveitados em toda a carga."""
+    return ReferenciaImportacao(carregar_aba_base(), carregar_logica_rateio())
 
-    df_out = pd.DataFrame({
-        "data": df["Data Baixa"].dt.strftime("%Y-%m-%d"),
-        "ano": int(ano_ref),
-        "mes": str(mes_num),
-        "conta_id": df["C. Resultado"].astype(str).str.split(" ").str[0].str.strip(),
-        "centro_custo": df["Centro de Custo"].astype(str).str.strip(),
-        "valor": df["valor"]
-    })
 
-    return df_out
+def validar_importacao(df_mov_supabase, referencia=None):
+    if referencia is None:
+        referencia = carregar_referencia_importacao()
 
+    return referencia.validar(df_mov_supabase)
+
+
+def inserir_periodos_com_sobrescrita(particoes):
+    """
+    Grava vários meses ({(ano, mes): DataFrame}) em paralelo. Índice,
+    cubo e caches são atualizados uma única vez, no fim, e só para
+    os meses que mudaram. Devolve {(ano, mes): resultado ou exceção}.
+    """
+    # Carga idêntica à anterior não grava nada; uma carga alterada
+    # aplica só a diferença, numa troca atômica via staging.
+    resultados = {periodo: None for periodo in particoes}
 
-def validar_importacao(df_mov_supabase):
-    df_base = carregar_aba_base()
-    df_rateio = carregar_logica_rateio()
+    def alterados():
+        return [
+            periodo for periodo, resultado in resultados.items()
+            if not isinstance(resultado, dict) or resultado["situacao"] != "inalterado"
+        ]
 
-    contas_base = set(df_base["Conta"].astype(str).str.strip()) if not df_base.empty else set()
-    ccs_rateio = set(df_rateio["Centro de Custo"].astype(str).str.strip()) if not df_rateio.empty else set()
+    try:
+        resultados = importar_periodos_movimentos(supabase_client, particoes)
+        gravados = [periodo for periodo in alterados() if isinstance(resultados[periodo], dict)]
 
-    contas_faltantes = sorted(set(df_mov_supabase["conta_id"].astype(str).str.strip()) - contas_base)
-    centros_faltantes = sorted(set(df_mov_supabase["centro_custo"].astype(str).str.strip()) - ccs_rateio)
+        if not gravados:
+            return resultados
 
-    return contas_faltantes, centros_faltantes
+        try:
+            registrar_periodo(
+                supabase_client,
+                [
+                    resumir_periodo(particoes[periodo], *periodo, digest=resultados[periodo]["digest"])
+                    for periodo in gravados
+                ]
+            )
+        except Exception as e:
+            st.warning(f"⚠️ Índice de períodos não atualizado: {type(e).__name__} - {e}")
+
+        # Cada mês do cubo é trocado por conta própria: uma falha não
+        # impede os demais, e o mês que falhou é remontado na leitura.
+        falhas_cubo = []
+
+        for ano, mes_num in gravados:
+            try:
+                registrar_periodo_cubo(
+                    supabase_client,
+                    ano,
+                    mes_num,
+                    montar_cubo(normalizar_movimentos(particoes[(ano, mes_num)])),
+                    digest=resultados[(ano, mes_num)]["digest"]
+                )
+            except Exception as e:
+                falhas_cubo.append(f"{MAPA_MESES_INV.get(mes_num, mes_num)}/{ano} ({type(e).__name__} - {e})")
+
+        if falhas_cubo:
+            st.warning(
+                "⚠️ Cubo financeiro não atualizado em: "
+                + "; ".join(falhas_cubo)
+                + ". Esses meses serão remontados a partir dos lançamentos na próxima leitura."
+            )
+
+        return resultados
+    finally:
+        # Só as partições reescritas deixam de valer no cache local e na
+        # memória (movimentos, agregados e índice), inclusive quando
+        # a carga falha no meio. Uma carga repetida não invalida nada.
+        periodos = alterados()
+
+        # A versão muda antes de apagar o arquivo: uma busca que ainda
+        # esteja em andamento vê a troca e não regrava a partição antiga.
+        if periodos:
+            invalidar_dependencia("movimentos_financeiros", periodos)
+            invalidar_dependencia("movimentos_indice")
+            for ano, mes_num in periodos:
+                invalidar_particao(ano, mes_num)
 
 
 def inserir_movimentos_com_sobrescrita(df_mov_supabase, ano, mes_num):
-    # Sobrescreve o mês importado.
-    supabase_client.table("movimentos_financeiros").delete().eq("ano", int(ano)).eq("mes", str(int(mes_num))).execute()
+    periodo = (int(ano), int(mes_num))
+    resultado = inserir_periodos_com_sobrescrita({periodo: df_mov_supabase})[periodo]
 
-    registros = df_mov_supabase.to_dict(orient="records")
-    tamanho_lote = 500
-    for i in range(0, len(registros), tamanho_lote):
-        supabase_client.table("movimentos_financeiros").insert(registros[i:i + tamanho_lote]).execute()
+    if isinstance(resultado, Exception):
+        raise resultado
+
+    return resultado
+
+
+def mostrar_faltantes_importacao(contas_faltantes, centros_faltantes):
+    if not contas_faltantes.empty:
+        st.warning(f"⚠️ Contas não encontradas no plano de contas: {len(contas_faltantes)}")
+        st.dataframe(contas_faltantes, use_container_width=True, hide_index=True)
+
+    if not centros_faltantes.empty:
+        st.warning(f"⚠️ Centros de custo sem configuração de rateio: {len(centros_faltantes)}")
+        st.dataframe(centros_faltantes, use_container_width=True, hide_index=True)
 
 # =========================
 # INTERFACE
 # =========================
 st.title("📊 Gestor Financeiro - Status Marcenaria")
 
-aba1, aba2, aba3, aba4, aba5, aba6, aba7, aba8, aba9, aba10, aba11, aba12, aba13, aba14 = st.tabs([
+ABAS = [
     "📥 Carga", "📈 Relatório", "🎯 Indicadores", "🏢 Obras", "⚖️ Comparativo",
     "⚠️ Alertas", "📉 Curva ABC", "🤖 Analista IA", "🧾 Composição da Obra",
     "⚙️ Configurações",
@@ -705,14 +800,30 @@ aba1, aba2, aba3, aba4, aba5, aba6, aba7, aba8, aba9, aba10, aba11, aba12, aba13
     "💰 Orçamento",
     "📊 Orçado x Realizado",
     "🎯 Painel Executivo"
-])
+]
+
+# Só a aba escolhida é executada em cada rerun; st.tabs executaria todas.
+aba_ativa = st.radio(
+    "Navegação",
+    ABAS,
+    horizontal=True,
+    key="aba_ativa",
+    label_visibility="collapsed"
+)
+
+
+@st.fragment
+def renderizar_em_fragmento(render, **kwargs):
+    """Interações dentro da aba reexecutam só a aba, não o app inteiro."""
+    render(**kwargs)
+
 
 # Sidebar baseada no Supabase
 st.sidebar.header("Filtros de Análise")
-df_mov_todos = carregar_todos_movimentos()
-abas_existentes = montar_abas_existentes_supabase(df_mov_todos)
+df_indice_mov = carregar_indice_movimentos()
+abas_existentes = montar_abas_existentes_supabase(df_indice_mov)
 
-anos_disponiveis = sorted(df_mov_todos["Ano"].dropna().astype(int).unique().tolist(), reverse=True) if not df_mov_todos.empty and "Ano" in df_mov_todos.columns else ANOS_PADRAO
+anos_disponiveis = sorted(df_indice_mov["Ano"].dropna().astype(int).unique().tolist(), reverse=True) if not df_indice_mov.empty and "Ano" in df_indice_mov.columns else ANOS_PADRAO
 ano_sel = st.sidebar.selectbox("Ano de Referência", anos_disponiveis, index=0)
 
 meses_disponiveis = [m for m in MESES_LISTA if f"{m}_{ano_sel}" in abas_existentes]
@@ -720,54 +831,153 @@ if not meses_disponiveis:
     meses_disponiveis = MESES_LISTA
 
 meses_sel = st.sidebar.multiselect("Meses (Filtro Geral)", meses_disponiveis, default=meses_disponiveis)
-lista_cc = obter_centros_custo(df_mov_todos)
+lista_cc = obter_centros_custo(df_indice_mov)
 cc_sel = st.sidebar.multiselect("Centros de Custo", ["Todos"] + lista_cc, default=["Todos"])
 niveis_sel = st.sidebar.multiselect("Níveis", [1, 2, 3, 4], default=[1, 2, 3, 4])
+st.sidebar.toggle(
+    "⚡ Agregação no servidor",
+    value=False,
+    key="agregacao_servidor",
+    help="Busca no banco as somas por ano, mês, conta e centro de custo em vez dos lançamentos individuais."
+)
 
-with aba1:
+if aba_ativa == "📥 Carga":
     st.subheader("📥 Carga de Dados no Supabase")
-    col_m, col_a = st.columns(2)
 
-    with col_m:
-        m_ref = st.selectbox("Mês", MESES_LISTA)
-    with col_a:
-        a_ref = st.selectbox("Ano", ANOS_PADRAO)
+    modo_carga = st.radio(
+        "Modo de carga",
+        ["Um mês", "Vários períodos"],
+        horizontal=True,
+        key="modo_carga",
+        help="Vários períodos: um ou mais Excel, divididos por mês pela Data Baixa."
+    )
 
-    arq = st.file_uploader("Subir Excel do Sistema", type=["xlsx"])
+    if modo_carga == "Vários períodos":
+        arquivos = st.file_uploader(
+            "Subir Excel do Sistema (um ou vários)",
+            type=["xlsx"],
+            accept_multiple_files=True
+        )
 
-    if arq and st.button("🚀 Salvar Período no Supabase"):
-        try:
-            df_carga = pd.read_excel(arq)
-            df_mov_import = preparar_movimentos_para_supabase(df_carga, a_ref, m_ref)
+        if arquivos and st.button("🚀 Salvar Períodos no Supabase"):
+            try:
+                df_mov_import = juntar_lotes_movimentos(
+                    lote
+                    for arquivo in arquivos
+                    for lote in gerar_lotes_movimentos(arquivo, origem=arquivo.name)
+                )
+                particoes = separar_por_periodo(df_mov_import)
+
+                if not particoes:
+                    st.warning("Nenhum lançamento encontrado nos arquivos enviados.")
+                else:
+                    st.info(
+                        "ℹ️ Períodos encontrados: "
+                        + ", ".join(f"{MAPA_MESES_INV[m]}/{a}" for a, m in particoes)
+                    )
+
+                    # Cada mês é substituído por inteiro: um mês cortado na
+                    # exportação apagaria os lançamentos que ficaram de fora.
+                    for ano, mes, primeira, ultima in periodos_parciais(df_mov_import):
+                        st.warning(
+                            f"⚠️ {MAPA_MESES_INV[mes]}/{ano} parece parcial: os lançamentos vão de "
+                            f"{primeira:%d/%m/%Y} a {ultima:%d/%m/%Y}. O mês inteiro será substituído "
+                            "por esses lançamentos."
+                        )
+
+                    # Uma única leitura do plano e do rateio valida todos os meses.
+                    referencia = carregar_referencia_importacao()
+                    centros_criados = cadastrar_centros_custo_automaticamente(df_mov_import, referencia)
+
+                    if centros_criados:
+                        st.info(f"ℹ️ {len(centros_criados)} centros cadastrados automaticamente como OBRA.")
+
+                    mostrar_faltantes_importacao(*validar_importacao(df_mov_import, referencia))
+
+                    resultados = inserir_periodos_com_sobrescrita(particoes)
+
+                    situacoes = {
+                        "inalterado": "sem alterações",
+                        "diferenca": "diferença aplicada",
+                        "substituido": "mês substituído",
+                    }
+
+                    st.dataframe(
+                        pd.DataFrame([
+                            {
+                                "Período": f"{MAPA_MESES_INV[mes]}/{ano}",
+                                "Lançamentos": len(particoes[(ano, mes)]),
+                                "Situação": (
+                                    f"erro: {type(resultado).__name__} - {resultado}"
+                                    if isinstance(resultado, Exception)
+                                    else situacoes[resultado["situacao"]]
+                                ),
+                                "Inseridos": 0 if isinstance(resultado, Exception) else resultado["inseridas"],
+                                "Removidos": 0 if isinstance(resultado, Exception) else resultado["removidas"],
+                            }
+                            for (ano, mes), resultado in resultados.items()
+                        ]),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
+                    erros = [r for r in resultados.values() if isinstance(r, Exception)]
+
+                    if erros:
+                        st.error(f"❌ {len(erros)} período(s) não foram gravados; os demais foram concluídos.")
+                    else:
+                        st.success(f"✅ {len(particoes)} períodos processados ({len(df_mov_import)} lançamentos).")
+
+            except Exception as e:
+                mostrar_erro("Erro na importação", e)
+
+    else:
+        col_m, col_a = st.columns(2)
 
-            contas_faltantes, centros_faltantes = validar_importacao(df_mov_import)
-            centros_criados = cadastrar_centros_custo_automaticamente(df_mov_import)
+        with col_m:
+            m_ref = st.selectbox("Mês", MESES_LISTA)
+        with col_a:
+            a_ref = st.selectbox("Ano", ANOS_PADRAO)
 
-            if centros_criados:
-                st.info(
-                    f"ℹ️ {len(centros_criados)} centros cadastrados automaticamente como OBRA."
+        arq = st.file_uploader("Subir Excel do Sistema", type=["xlsx"])
+
+        if arq and st.button("🚀 Salvar Período no Supabase"):
+            try:
+                mes_num = MAPA_MESES[m_ref]
+
+                # Lê e prepara o Excel em blocos: só os lançamentos já
+                # convertidos ficam na memória, não a planilha inteira.
+                df_mov_import = juntar_lotes_movimentos(
+                    gerar_lotes_movimentos(arq, a_ref, mes_num, m_ref)
                 )
-            
-            # recarrega após inserir
-            contas_faltantes, centros_faltantes = validar_importacao(df_mov_import)
-            
-            if contas_faltantes:
-                st.warning(f"⚠️ Contas não encontradas no plano de contas: {len(contas_faltantes)}")
-                st.dataframe(pd.DataFrame({"conta_id": contas_faltantes}), use_container_width=True)
-
-            if centros_faltantes:
-                st.warning(f"⚠️ Centros de custo sem configuração de rateio: {len(centros_faltantes)}")
-                st.dataframe(pd.DataFrame({"centro_custo": centros_faltantes}), use_container_width=True)
-
-            mes_num = MAPA_MESES[m_ref]
-            inserir_movimentos_com_sobrescrita(df_mov_import, a_ref, mes_num)
-            st.cache_data.clear()
-            st.success(f"✅ {len(df_mov_import)} lançamentos de {m_ref}/{a_ref} gravados no Supabase com sobrescrita do mês.")
 
-        except Exception as e:
-            mostrar_erro("Erro na importação", e)
+                referencia = carregar_referencia_importacao()
+                centros_criados = cadastrar_centros_custo_automaticamente(df_mov_import, referencia)
+
+                if centros_criados:
+                    st.info(
+                        f"ℹ️ {len(centros_criados)} centros cadastrados automaticamente como OBRA."
+                    )
+
+                # Os centros recém-cadastrados já estão na referência.
+                mostrar_faltantes_importacao(*validar_importacao(df_mov_import, referencia))
+
+                resultado = inserir_movimentos_com_sobrescrita(df_mov_import, a_ref, mes_num)
 
-with aba2:
+                if resultado["situacao"] == "inalterado":
+                    st.info(f"ℹ️ {m_ref}/{a_ref} já está no Supabase com o mesmo conteúdo. Nada foi gravado.")
+                elif resultado["situacao"] == "diferenca":
+                    st.success(
+                        f"✅ {m_ref}/{a_ref} atualizado: {resultado['inseridas']} lançamentos inseridos "
+                        f"e {resultado['removidas']} removidos ({len(df_mov_import)} no mês)."
+                    )
+                else:
+                    st.success(f"✅ {len(df_mov_import)} lançamentos de {m_ref}/{a_ref} gravados no Supabase com sobrescrita do mês.")
+
+            except Exception as e:
+                mostrar_erro("Erro na importação", e)
+
+if aba_ativa == "📈 Relatório":
     st.markdown(
         """<style>.stDataFrame div[data-testid="stHorizontalScrollContainer"] { transform: rotateX(180deg); } .stDataFrame div[data-testid="stHorizontalScrollContainer"] > div { transform: rotateX(180deg); }</style>""",
         unsafe_allow_html=True
@@ -813,7 +1023,7 @@ with aba2:
                 height=800
             )
 
-with aba3:
+if aba_ativa == "🎯 Indicadores":
     st.subheader("🎯 Indicadores de Gestão")
 
     if st.button("📈 Ver Dashboard Completo", key="btn_aba3_completo"):
@@ -977,7 +1187,7 @@ with aba3:
                 use_container_width=True
             )
 
-with aba4:
+if aba_ativa == "🏢 Obras":
     st.subheader("🏢 Análise de Obras e Rateio Dinâmico")
 
     col_f1, col_f2 = st.columns(2)
@@ -994,12 +1204,7 @@ with aba4:
         if df_all.empty:
             st.warning("Sem dados para o período selecionado.")
         else:
-            res_cc_full = df_all.groupby("Centro de Custo").apply(
-                lambda x: pd.Series({
-                    "Receitas": x[x["Conta_ID"].astype(str).str.startswith("01")]["Valor_Final"].sum(),
-                    "Despesa Direta": x[x["Conta_ID"].astype(str).str.startswith("02")]["Valor_Final"].sum(),
-                })
-            ).reset_index()
+            df_rateio_config = None
 
             if usar_rateio:
                 df_rateio_config = carregar_logica_rateio()
@@ -1007,25 +1212,18 @@ with aba4:
                     st.info("ℹ️ Não foi possível ler rateio_config.")
                     st.stop()
 
-                mapa_logica = dict(zip(df_rateio_config["Centro de Custo"], df_rateio_config["Logica"]))
-                res_cc_full["Logica"] = res_cc_full["Centro de Custo"].astype(str).str.strip().map(mapa_logica).fillna("obra")
-                bolo_rateio = res_cc_full.loc[res_cc_full["Logica"] == "rateio", "Despesa Direta"].sum()
-                res_cc_full["Rateio Estrutura"] = 0.0
-
-                idx_obras = (res_cc_full["Logica"] == "obra") & (res_cc_full["Despesa Direta"] != 0)
-                total_desp_receptores = res_cc_full.loc[idx_obras, "Despesa Direta"].sum()
-
-                if abs(total_desp_receptores) > 0:
-                    res_cc_full.loc[idx_obras, "Rateio Estrutura"] = (
-                        res_cc_full.loc[idx_obras, "Despesa Direta"] / total_desp_receptores
-                    ) * bolo_rateio
+            res_cc_full = calcular_resultado_centros(
+                df_all,
+                df_rateio_config,
+                usar_rateio=usar_rateio
+            ).rename(columns={"Receita": "Receitas"})
 
+            if usar_rateio:
                 res_cc_final = res_cc_full[res_cc_full["Logica"] == "obra"].copy()
-                res_cc_final["Resultado Real"] = res_cc_final["Receitas"] + res_cc_final["Despesa Direta"] + res_cc_final["Rateio Estrutura"]
+                res_cc_final = res_cc_final.rename(columns={"Resultado": "Resultado Real"})
                 cols_v = ["Centro de Custo", "Receitas", "Despesa Direta", "Rateio Estrutura", "Resultado Real"]
             else:
                 res_cc_final = res_cc_full.copy()
-                res_cc_final["Resultado"] = res_cc_final["Receitas"] + res_cc_final["Despesa Direta"]
                 cols_v = ["Centro de Custo", "Receitas", "Despesa Direta", "Resultado"]
 
             if "Todos" not in cc_sel and cc_sel:
@@ -1044,7 +1242,53 @@ with aba4:
 
             st.download_button("📥 Exportar Obras (Excel)", data=buffer_cc.getvalue(), file_name="Obras_CustoReal.xlsx")
 
-with aba5:
+    with st.expander("🧪 Simular Cenários de Rateio"):
+        st.caption(
+            "Compara o resultado das obras com outras formas de rateio, "
+            "sem alterar o rateio_config."
+        )
+        comparar_receita = st.checkbox("Ratear a estrutura pela receita das obras", value=True, key="cenario_receita_v17")
+        comparar_peso = st.checkbox(
+            "Ratear a estrutura pelo peso das obras",
+            value=False,
+            key="cenario_peso_v17",
+            help="Usa a coluna Peso dos centros de custo (Configurações)."
+        )
+        centros_reclassificados = st.multiselect(
+            "Centros tratados como rateio",
+            lista_cc,
+            key="cenario_reclassificados_v17"
+        )
+
+        if st.button("🧪 Comparar Cenários", key="btn_cenarios_rateio_v17"):
+            df_rateio_config = carregar_logica_rateio()
+            df_all = obter_movimentos_por_anos_meses(anos_obras_sel, meses_obras_sel)
+
+            cenarios = [{"nome": "Atual", "driver": "despesa_direta"}]
+            if comparar_receita:
+                cenarios.append({"nome": "Pela Receita", "driver": "receita"})
+            if comparar_peso:
+                cenarios.append({"nome": "Pelo Peso", "driver": "peso"})
+            if centros_reclassificados:
+                cenarios.append({
+                    "nome": "Reclassificado",
+                    "logicas": {c: "rateio" for c in centros_reclassificados}
+                })
+
+            df_cenarios = comparar_cenarios_rateio(df_all, cenarios, df_rateio_config)
+
+            if df_cenarios.empty:
+                st.warning("Sem dados para o período selecionado.")
+            else:
+                st.dataframe(
+                    df_cenarios.style.format(
+                        {c: formatar_moeda_br for c in df_cenarios.columns if c != "Centro de Custo"},
+                        na_rep="-"
+                    ),
+                    use_container_width=True
+                )
+
+if aba_ativa == "⚖️ Comparativo":
     st.subheader("⚖️ Comparativo de Períodos Independente")
     ocultar_aba5 = st.checkbox("🚫 Ocultar sem Movimento", value=False, key="ocultar_aba5_v17")
 
@@ -1062,16 +1306,14 @@ with aba5:
             st.warning("Plano de contas vazio.")
             st.stop()
 
-        df_base_c["Conta"] = df_base_c.apply(lambda x: limpar_conta_blindado(x["Conta"], x["Nivel"]), axis=1).astype(str).str.strip()
-
         def calc_soberano(anos_alvo, meses_alvo):
             map_res = {}
             df = obter_movimentos_por_anos_meses(anos_alvo, meses_alvo)
             if df.empty:
                 return map_res
             if "Todos" not in cc_sel and cc_sel:
-                df = df[df["Centro de Custo"].isin(cc_sel)]
-            somas = df.groupby("Conta_ID")["Valor_Final"].sum().to_dict()
+                df = fatiar_cubo(df, centros_custo=cc_sel)
+            somas = somar_cubo(df, "Conta_ID").to_dict()
             for conta, valor in somas.items():
                 map_res[str(conta).strip()] = map_res.get(str(conta).strip(), 0) + valor
             return map_res
@@ -1082,15 +1324,13 @@ with aba5:
         df_base_c["PERÍODO A"] = df_base_c["Conta"].map(dados_a).fillna(0)
         df_base_c["PERÍODO B"] = df_base_c["Conta"].map(dados_b).fillna(0)
 
-        for n in [3, 2]:
-            for idx, row in df_base_c[df_base_c["Nivel"] == n].iterrows():
-                pref = str(row["Conta"]).strip() + "."
-                df_base_c.at[idx, "PERÍODO A"] = df_base_c[(df_base_c["Nivel"] == 4) & (df_base_c["Conta"].str.startswith(pref))]["PERÍODO A"].sum()
-                df_base_c.at[idx, "PERÍODO B"] = df_base_c[(df_base_c["Nivel"] == 4) & (df_base_c["Conta"].str.startswith(pref))]["PERÍODO B"].sum()
-
-        for idx, _ in df_base_c[df_base_c["Nivel"] == 1].iterrows():
-            df_base_c.at[idx, "PERÍODO A"] = df_base_c[df_base_c["Nivel"] == 2]["PERÍODO A"].sum()
-            df_base_c.at[idx, "PERÍODO B"] = df_base_c[df_base_c["Nivel"] == 2]["PERÍODO B"].sum()
+        df_base_c = consolidar_valores_plano(
+            df_base_c,
+            ["PERÍODO A", "PERÍODO B"],
+            somar_lancamento_direto=False,
+            nivel_maximo=4,
+            substituir_sempre=True
+        )
 
         df_base_c["DIFERENÇA"] = df_base_c["PERÍODO B"] - df_base_c["PERÍODO A"]
         df_base_c["VAR %"] = df_base_c.apply(lambda x: (x["DIFERENÇA"] / abs(x["PERÍODO A"]) * 100) if x["PERÍODO A"] != 0 else 0, axis=1)
@@ -1105,11 +1345,11 @@ with aba5:
             "VAR %": formatar_pct
         }), use_container_width=True, height=750)
 
-with aba6:
+if aba_ativa == "⚠️ Alertas":
     st.subheader("⚠️ Central de Alertas Preventivos")
     st.info("Nesta versão Supabase, os alertas serão recalibrados após validação do relatório e obras.")
 
-with aba7:
+if aba_ativa == "📉 Curva ABC":
     st.subheader("📉 Curva ABC de Despesas (Nível 4)")
     if st.button("🔍 Gerar Curva ABC", key="btn_aba7_final"):
         df_abc, _ = processar_bi(ano_sel, meses_sel, cc_sel)
@@ -1137,10 +1377,10 @@ with aba7:
             else:
                 st.info("Sem despesas para gerar Curva ABC.")
 
-with aba8:
+if aba_ativa == "🤖 Analista IA":
     render_aba_analista_ia(ano_sel, meses_sel, cc_sel, processar_bi)
 
-with aba9:
+if aba_ativa == "🧾 Composição da Obra":
     st.subheader("🧾 Composição da Obra")
 
     col_f1, col_f2 = st.columns(2)
@@ -1211,33 +1451,22 @@ with aba9:
                 st.warning("As obras selecionadas não possuem lançamentos no período informado.")
                 st.stop()
     
-            direto = df_sel.groupby("Conta_ID")["Valor_Final"].sum()
+            direto = df_sel.groupby("Conta_ID", observed=True)["Valor_Final"].sum()
             direto_desp = direto[direto.index.astype(str).str.startswith("02")].copy()
     
-            mapa_logica = dict(zip(df_rateio["Centro de Custo"], df_rateio["Logica"]))
-            res_cc_full = df_all.groupby("Centro de Custo").apply(
-                lambda x: pd.Series({
-                    "Receitas": x[x["Conta_ID"].astype(str).str.startswith("01")]["Valor_Final"].sum(),
-                    "Despesa Direta": x[x["Conta_ID"].astype(str).str.startswith("02")]["Valor_Final"].sum(),
-                })
-            ).reset_index()
-    
-            res_cc_full["Logica"] = res_cc_full["Centro de Custo"].astype(str).str.strip().map(mapa_logica).fillna("obra")
-            bolo_rateio = res_cc_full.loc[res_cc_full["Logica"] == "rateio", "Despesa Direta"].sum()
-            idx_obras = (res_cc_full["Logica"] == "obra") & (res_cc_full["Despesa Direta"] != 0)
-            total_desp_receptores = res_cc_full.loc[idx_obras, "Despesa Direta"].sum()
-    
-            rateio_recebido_conjunto = 0.0
-            if abs(total_desp_receptores) > 0:
-                desp_direta_conjunto = res_cc_full[res_cc_full["Centro de Custo"].isin(obras_sel)]["Despesa Direta"].sum()
-                rateio_recebido_conjunto = (desp_direta_conjunto / total_desp_receptores) * bolo_rateio
+            res_cc_full = calcular_resultado_centros(
+                df_all,
+                df_rateio,
+                usar_rateio=usar_rateio_comp
+            )
+            rateio_recebido_conjunto = res_cc_full.loc[
+                res_cc_full["Centro de Custo"].isin(obras_sel),
+                "Rateio Estrutura"
+            ].sum()
     
             rateado = pd.Series(0.0, index=direto.index)
-            total_desp_direta = direto_desp.sum()
-            if abs(total_desp_direta) > 0 and not direto_desp.empty:
-                proporcao_desp = direto_desp / total_desp_direta
-                rateado_desp = proporcao_desp * rateio_recebido_conjunto
-                rateado.loc[rateado_desp.index] = rateado_desp
+            rateado_desp = distribuir_proporcionalmente(direto_desp, rateio_recebido_conjunto)
+            rateado.loc[rateado_desp.index] = rateado_desp
     
             final = direto + rateado
     
@@ -1274,7 +1503,8 @@ with aba9:
     
             st.download_button("📥 Exportar Composição da Obra (Excel)", data=buffer_comp.getvalue(), file_name="Composicao_Obra_Consolidada.xlsx")
 
-with aba10:
+
+def render_aba_configuracoes():
     st.subheader("⚙️ Configurações")
 
     tab_pc, tab_rateio = st.tabs([
@@ -1285,7 +1515,7 @@ with aba10:
     with tab_pc:
         st.write("### 📚 Plano de Contas")
 
-        df_pc_raw = pd.DataFrame(supabase_fetch_all("plano_contas"))
+        df_pc_raw = aplicar_esquema(supabase_fetch_all("plano_contas", colunas_select("plano_contas")), "plano_contas")
 
         if df_pc_raw.empty:
             st.warning("Plano de contas vazio.")
@@ -1327,13 +1557,14 @@ with aba10:
                             "nivel": int(nivel)
                         }).eq("id", int(row["id"])).execute()
 
-                st.cache_data.clear()
+                invalidar_dependencia("plano_contas")
                 st.success("Plano de contas salvo com sucesso.")
 
     with tab_rateio:
         st.write("### 🏢 Centros de Custo / Rateio")
 
-        df_rateio_raw = pd.DataFrame(supabase_fetch_all("rateio_config"))
+        df_rateio_raw = aplicar_esquema(buscar_rateio_config(), "rateio_config")
+        tem_peso = "peso" in df_rateio_raw.columns
 
         if df_rateio_raw.empty:
             st.warning("Nenhum centro de custo cadastrado.")
@@ -1352,6 +1583,11 @@ with aba10:
                         "Lógica",
                         options=["obra", "rateio", "fora"],
                         required=True
+                    ),
+                    "peso": st.column_config.NumberColumn(
+                        "Peso",
+                        min_value=0.0,
+                        help="Base do rateio por peso (ex.: equipe alocada na obra)."
                     )
                 }
             )
@@ -1364,42 +1600,52 @@ with aba10:
                     if not centro or logica not in ["obra", "rateio", "fora"]:
                         continue
 
+                    registro = {
+                        "centro_custo": centro,
+                        "logica": logica
+                    }
+
+                    # Só grava peso se a coluna existir no banco.
+                    if tem_peso:
+                        peso = pd.to_numeric(row.get("peso"), errors="coerce")
+                        registro["peso"] = None if pd.isna(peso) else float(peso)
+
                     if pd.isna(row.get("id")):
-                        supabase_client.table("rateio_config").insert({
-                            "centro_custo": centro,
-                            "logica": logica
-                        }).execute()
+                        supabase_client.table("rateio_config").insert(registro).execute()
                     else:
-                        supabase_client.table("rateio_config").update({
-                            "centro_custo": centro,
-                            "logica": logica
-                        }).eq("id", int(row["id"])).execute()
+                        supabase_client.table("rateio_config").update(registro).eq("id", int(row["id"])).execute()
 
-                st.cache_data.clear()
+                invalidar_dependencia("rateio_config")
                 st.success("Centros de custo atualizados com sucesso.")
 
-with aba11:
-    render_aba_resultado_operacional(
+
+if aba_ativa == "⚙️ Configurações":
+    renderizar_em_fragmento(render_aba_configuracoes)
+
+if aba_ativa == "📊 Resultado Operacional":
+    renderizar_em_fragmento(
+        render_aba_resultado_operacional,
         ano_sel=ano_sel,
         meses_sel=meses_sel,
         cc_sel=cc_sel,
         niveis_sel=niveis_sel,
         MAPA_MESES=MAPA_MESES,
         carregar_aba_base=carregar_aba_base,
-        carregar_movimentos_periodo=carregar_movimentos_periodo,
+        carregar_movimentos_periodo=carregar_movimentos_relatorio,
         filtrar_linhas_zeradas=filtrar_linhas_zeradas,
         formatar_moeda_br=formatar_moeda_br
     )
 
-with aba12:
-
-    render_aba_orcamento_obz(
+if aba_ativa == "💰 Orçamento":
+    renderizar_em_fragmento(
+        render_aba_orcamento_obz,
         supabase_client=supabase_client,
         carregar_aba_base=carregar_aba_base
     )
 
-with aba13:
-    render_aba_orcado_realizado(
+if aba_ativa == "📊 Orçado x Realizado":
+    renderizar_em_fragmento(
+        render_aba_orcado_realizado,
         supabase_client=supabase_client,
         carregar_aba_base=carregar_aba_base,
         processar_bi=processar_bi,
@@ -1408,8 +1654,9 @@ with aba13:
         cc_sel=cc_sel
     )
 
-with aba14:
-    render_aba_painel_executivo(
+if aba_ativa == "🎯 Painel Executivo":
+    renderizar_em_fragmento(
+        render_aba_painel_executivo,
         ano_sel=ano_sel,
         meses_sel=meses_sel,
         cc_sel=cc_sel,
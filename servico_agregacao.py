@@ -0,0 +1,122 @@
+import pandas as pd
+
+from servico_busca_supabase import buscar_todos_keyset
+
+
+VIEW_MOVIMENTOS_AGREGADOS = "movimentos_agregados"
+
+# Mesmo SQL roda no Postgres do Supabase e em um SQLite local de testes.
+SQL_VIEW_MOVIMENTOS_AGREGADOS = """
+create view movimentos_agregados as
+select
+    ano,
+    cast(mes as integer) as mes,
+    conta_id,
+    centro_custo,
+    sum(valor) as valor,
+    count(*) as quantidade
+from movimentos_financeiros
+group by ano, cast(mes as integer), conta_id, centro_custo
+"""
+
+# Chave de cada linha agregada dentro de um ano, usada na
+# paginação por keyset da view e do cubo.
+CHAVE_AGREGADOS = ["mes", "conta_id", "centro_custo"]
+
+COLUNAS_AGREGACAO = [
+    "Ano",
+    "Mes",
+    "Conta_ID",
+    "Centro de Custo",
+]
+
+
+def agregar_movimentos(df_mov):
+    """
+    Versão local (pandas) da view movimentos_agregados.
+
+    Recebe movimentos normalizados e devolve uma linha por
+    (Ano, Mes, Conta_ID, Centro de Custo) com Valor_Final somado
+    e a Quantidade de lançamentos. Como os relatórios só somam
+    Valor_Final, o resultado pode substituir os lançamentos brutos.
+    """
+
+    if df_mov is None or df_mov.empty:
+        return pd.DataFrame(
+            columns=COLUNAS_AGREGACAO + ["Valor_Final", "Quantidade"]
+        )
+
+    df = df_mov.copy()
+
+    for coluna in COLUNAS_AGREGACAO:
+        if coluna not in df.columns:
+            df[coluna] = pd.NA
+
+    return (
+        df
+        .groupby(COLUNAS_AGREGACAO, dropna=False, observed=True)
+        .agg(
+            Valor_Final=("Valor_Final", "sum"),
+            Quantidade=("Valor_Final", "size"),
+        )
+        .reset_index()
+    )
+
+
+def normalizar_agregados(registros):
+    """
+    Converte as linhas da view para o padrão interno do app.
+    """
+
+    df = pd.DataFrame(registros)
+
+    if df.empty:
+        return agregar_movimentos(None)
+
+    df.columns = [str(c).strip().lower() for c in df.columns]
+
+    df = df.rename(columns={
+        "ano": "Ano",
+        "mes": "Mes",
+        "conta_id": "Conta_ID",
+        "centro_custo": "Centro de Custo",
+        "valor": "Valor_Final",
+        "quantidade": "Quantidade",
+    })
+
+    df["Ano"] = pd.to_numeric(df["Ano"], errors="coerce").astype("Int64")
+    df["Mes"] = pd.to_numeric(df["Mes"], errors="coerce").astype("Int64")
+    df["Conta_ID"] = df["Conta_ID"].astype(str).str.strip()
+    df["Centro de Custo"] = df["Centro de Custo"].astype(str).str.strip()
+    df["Valor_Final"] = pd.to_numeric(df["Valor_Final"], errors="coerce").fillna(0.0)
+    df["Quantidade"] = pd.to_numeric(
+        df.get("Quantidade", 0),
+        errors="coerce"
+    ).fillna(0).astype(int)
+
+    return df[COLUNAS_AGREGACAO + ["Valor_Final", "Quantidade"]]
+
+
+def buscar_agregados(supabase_client, ano, meses_numeros):
+    """
+    Pede ao banco as somas já agrupadas por
+    (ano, mes, conta_id, centro_custo) dos meses informados.
+    """
+
+    meses = [int(m) for m in meses_numeros]
+
+    if not meses:
+        return agregar_movimentos(None)
+
+    return normalizar_agregados(
+        buscar_todos_keyset(
+            lambda: (
+                supabase_client
+                .table(VIEW_MOVIMENTOS_AGREGADOS)
+                .select("*")
+                .eq("ano", int(ano))
+                .in_("mes", meses)
+            ),
+            coluna_chave=CHAVE_AGREGADOS
+        )
+    )
@@ -0,0 +1,253 @@
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+MAX_REQUISICOES_SIMULTANEAS = 4
+TENTATIVAS_PADRAO = 3
+ESPERA_INICIAL_SEGUNDOS = 0.5
+
+
+def executar_com_retentativa(
+    funcao,
+    tentativas=TENTATIVAS_PADRAO,
+    espera_inicial=ESPERA_INICIAL_SEGUNDOS
+):
+    """
+    Executa funcao() repetindo em caso de erro, com espera
+    exponencial (0,5s, 1s, 2s...) e um pequeno sorteio para
+    que requisições paralelas não tentem de novo ao mesmo tempo.
+    """
+
+    for tentativa in range(tentativas):
+        try:
+            return funcao()
+        except Exception:
+            if tentativa == tentativas - 1:
+                raise
+
+            time.sleep(
+                espera_inicial * (2 ** tentativa)
+                + random.uniform(0, espera_inicial)
+            )
+
+
+def executar_em_paralelo(
+    tarefas,
+    max_simultaneas=MAX_REQUISICOES_SIMULTANEAS
+):
+    """
+    Executa as tarefas (funções sem argumentos) em um pool de
+    threads limitado e devolve os resultados na mesma ordem
+    das tarefas, independente de qual terminou primeiro.
+    """
+
+    tarefas = list(tarefas)
+
+    if len(tarefas) <= 1 or max_simultaneas <= 1:
+        return [tarefa() for tarefa in tarefas]
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_simultaneas, len(tarefas))
+    ) as executor:
+        futuros = [
+            executor.submit(tarefa)
+            for tarefa in tarefas
+        ]
+
+        return [futuro.result() for futuro in futuros]
+
+
+def buscar_paginado_concorrente(
+    montar_consulta,
+    passo=1000,
+    max_simultaneas=MAX_REQUISICOES_SIMULTANEAS
+):
+    """
+    Busca todos os registros de uma consulta do Supabase.
+
+    montar_consulta(count) deve devolver uma consulta nova, já
+    filtrada e com ordem estável. A primeira página pede a contagem
+    total; as demais páginas são buscadas em paralelo e juntadas
+    na ordem das páginas.
+    """
+
+    primeira = executar_com_retentativa(
+        lambda: (
+            montar_consulta("exact")
+            .range(0, passo - 1)
+            .execute()
+        )
+    )
+
+    dados = list(primeira.data or [])
+    total = getattr(primeira, "count", None)
+
+    if len(dados) < passo:
+        return dados
+
+    if total is None:
+        # Sem contagem, segue página a página.
+        inicio = passo
+
+        while True:
+            lote = executar_com_retentativa(
+                lambda inicio=inicio: (
+                    montar_consulta(None)
+                    .range(inicio, inicio + passo - 1)
+                    .execute()
+                )
+            ).data or []
+
+            dados.extend(lote)
+
+            if len(lote) < passo:
+                return dados
+
+            inicio += passo
+
+    paginas = math.ceil(int(total) / passo)
+
+    def buscar_pagina(inicio):
+        return lambda: executar_com_retentativa(
+            lambda: (
+                montar_consulta(None)
+                .range(inicio, inicio + passo - 1)
+                .execute()
+            )
+        ).data or []
+
+    lotes = executar_em_paralelo(
+        [buscar_pagina(pagina * passo) for pagina in range(1, paginas)],
+        max_simultaneas=max_simultaneas
+    )
+
+    for lote in lotes:
+        dados.extend(lote)
+
+    return dados
+
+
+def _valor_filtro(valor):
+    """
+    Valor entre aspas para filtros or=(...) do PostgREST, que não
+    quebram com vírgulas, pontos ou parênteses nos códigos.
+    """
+
+    texto = str(valor).replace("\\", "\\\\").replace('"', '\\"')
+
+    return f'"{texto}"'
+
+
+def _filtro_apos_chave(colunas, valores):
+    """
+    Filtro or=(...) do PostgREST para (colunas) > (valores) na
+    ordem lexicográfica da chave composta:
+    a > x, ou a = x e b > y, ou a = x e b = y e c > z...
+    """
+
+    termos = []
+
+    for i, coluna in enumerate(colunas):
+        condicoes = [
+            f"{anterior}.eq.{_valor_filtro(valor)}"
+            for anterior, valor in zip(colunas[:i], valores[:i])
+        ]
+        condicoes.append(f"{coluna}.gt.{_valor_filtro(valores[i])}")
+
+        termos.append(
+            f"and({','.join(condicoes)})"
+            if len(condicoes) > 1
+            else condicoes[0]
+        )
+
+    return ",".join(termos)
+
+
+def iterar_paginas_keyset(
+    montar_consulta,
+    coluna_chave="id",
+    tamanho_pagina=1000
+):
+    """
+    Percorre uma consulta do Supabase por keyset: cada página pede
+    os registros com coluna_chave maior que o último já lido,
+    sempre ordenados pela chave. Não pula nem repete linhas quando
+    os dados mudam durante a leitura e não fica mais lento nas
+    páginas finais, como acontece com .range(inicio, fim).
+
+    coluna_chave pode ser uma lista de colunas (chave composta,
+    sem nulos), comparada na ordem em que foi informada.
+
+    montar_consulta() deve devolver uma consulta nova, já filtrada,
+    sem ordem nem limite. As páginas são entregues como listas de
+    registros; enquanto quem chamou processa uma página, a próxima
+    já está sendo baixada em segundo plano.
+    """
+
+    composta = not isinstance(coluna_chave, str)
+    colunas = list(coluna_chave) if composta else [coluna_chave]
+
+    def buscar(ultima_chave):
+        def executar():
+            consulta = montar_consulta()
+
+            if ultima_chave is not None:
+                consulta = (
+                    consulta.or_(_filtro_apos_chave(colunas, ultima_chave))
+                    if composta
+                    else consulta.gt(coluna_chave, ultima_chave)
+                )
+
+            for coluna in colunas:
+                consulta = consulta.order(coluna)
+
+            return (
+                consulta
+                .limit(tamanho_pagina)
+                .execute()
+            )
+
+        return executar_com_retentativa(executar).data or []
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futuro = executor.submit(buscar, None)
+
+        while futuro is not None:
+            pagina = futuro.result()
+            futuro = None
+
+            if len(pagina) >= tamanho_pagina:
+                ultima = pagina[-1]
+
+                futuro = executor.submit(
+                    buscar,
+                    [ultima[coluna] for coluna in colunas]
+                    if composta
+                    else ultima[coluna_chave]
+                )
+
+            if pagina:
+                yield pagina
+
+
+def buscar_todos_keyset(
+    montar_consulta,
+    coluna_chave="id",
+    tamanho_pagina=1000
+):
+    """
+    Junta em uma lista todas as páginas de iterar_paginas_keyset.
+    """
+
+    dados = []
+
+    for pagina in iterar_paginas_keyset(
+        montar_consulta,
+        coluna_chave=coluna_chave,
+        tamanho_pagina=tamanho_pagina
+    ):
+        dados.extend(pagina)
+
+    return dados
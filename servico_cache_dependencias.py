@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+# Tabelas derivadas e as tabelas de onde vêm seus dados.
+# Invalidar a origem invalida também o que é derivado dela,
+# respeitando a mesma partição (ano, mês) quando houver.
+FONTES_DERIVADAS = {
+    "movimentos_agregados": ("movimentos_financeiros",),
+    "movimentos_cubo": ("movimentos_financeiros",),
+    "movimentos_indice": ("movimentos_financeiros",),
+}
+
+_lock = threading.Lock()
+
+# Contadores de versão, compartilhados por todas as sessões do processo:
+# - _versao_tabela: muda quando a tabela inteira é invalidada
+# - _versao_particao: muda quando uma partição é invalidada
+# - _versao_qualquer: muda em qualquer invalidação da tabela
+_versao_tabela = defaultdict(int)
+_versao_particao = defaultdict(int)
+_versao_qualquer = defaultdict(int)
+
+
+def _normalizar_particao(particao):
+    ano, mes = particao
+    return int(ano), int(mes)
+
+
+def versao_dependencias(tabela, particoes=None):
+    """
+    Devolve um token que muda sempre que os dados lidos de
+    `tabela` (ou das partições (ano, mês) informadas) mudam.
+
+    Passado como argumento de uma função com @st.cache_data,
+    faz com que só os resultados afetados sejam recalculados;
+    os demais continuam no cache.
+
+    Sem partições, o token considera qualquer alteração na tabela.
+    """
+
+    with _lock:
+        if particoes is None:
+            token = (tabela, _versao_qualquer[tabela])
+        else:
+            token = (
+                tabela,
+                _versao_tabela[tabela],
+                tuple(
+                    _versao_particao[(tabela, _normalizar_particao(p))]
+                    for p in particoes
+                ),
+            )
+
+    fontes = tuple(
+        versao_dependencias(fonte, particoes)
+        for fonte in FONTES_DERIVADAS.get(tabela, ())
+    )
+
+    return token + fontes
+
+
+def invalidar_dependencia(tabela, particoes=None):
+    """
+    Marca como desatualizados os dados de `tabela`.
+
+    Com particoes=[(ano, mes), ...] apenas essas partições (e o que
+    depende da tabela inteira) deixam de valer; sem partições,
+    a tabela toda é invalidada.
+    """
+
+    with _lock:
+        if particoes is None:
+            _versao_tabela[tabela] += 1
+        else:
+            for particao in particoes:
+                _versao_particao[(tabela, _normalizar_particao(particao))] += 1
+
+        _versao_qualquer[tabela] += 1
+
+
+class CacheLRU:
+    """
+    Memória de resultados limitada às `limite` chaves mais recentes
+    e, opcionalmente, a `ttl_segundos` de validade por resultado.
+
+    Compartilhada entre sessões: a chave deve incluir o
+    versao_dependencias() dos dados usados no cálculo.
+    """
+
+    def __init__(self, limite, ttl_segundos=None):
+        self.limite = limite
+        self.ttl_segundos = ttl_segundos
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        """
+        Devolve o resultado guardado ou None.
+        """
+
+        with self._lock:
+            item = self._itens.get(chave)
+
+            if item is None:
+                return None
+
+            criado_em, valor = item
+
+            if (
+                self.ttl_segundos is not None
+                and time.monotonic() - criado_em > self.ttl_segundos
+            ):
+                del self._itens[chave]
+                return None
+
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic(), valor)
+            self._itens.move_to_end(chave)
+
+            while len(self._itens) > self.limite:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
@@ -0,0 +1,222 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from servico_busca_supabase import executar_em_paralelo
+from servico_cache_dependencias import versao_dependencias
+from servico_esquemas import aplicar_esquema
+
+
+DIRETORIO_CACHE_MOVIMENTOS = (
+    Path(__file__).resolve().parent
+    / ".cache"
+    / "movimentos_financeiros"
+)
+
+ARQUIVO_PARTICAO = "dados.parquet"
+
+TABELA_MOVIMENTOS = "movimentos_financeiros"
+
+
+def tipar_movimentos(df):
+    """
+    Converte os registros brutos de movimentos_financeiros
+    para os tipos do esquema antes de gravar em disco.
+
+    Conta e centro de custo ficam como texto na partição: cada mês
+    teria categorias diferentes e a junção perderia o tipo categórico.
+    """
+
+    return aplicar_esquema(
+        df,
+        "movimentos_financeiros",
+        categorias=False
+    )
+
+
+def caminho_particao(ano, mes, diretorio=None):
+    base = Path(diretorio or DIRETORIO_CACHE_MOVIMENTOS)
+
+    return (
+        base
+        / f"ano={int(ano)}"
+        / f"mes={int(mes)}"
+        / ARQUIVO_PARTICAO
+    )
+
+
+def ler_particao(ano, mes, diretorio=None):
+    """
+    Lê a partição (ano, mês) do disco.
+
+    Retorna None quando a partição não existe ou não pode ser lida,
+    para que quem chamou busque novamente no Supabase.
+    """
+
+    caminho = caminho_particao(ano, mes, diretorio)
+
+    if not caminho.exists():
+        return None
+
+    try:
+        return pd.read_parquet(caminho)
+    except Exception:
+        return None
+
+
+def gravar_particao(ano, mes, df, diretorio=None):
+    """
+    Grava a partição de forma atômica: escreve em arquivo
+    temporário e só então substitui o arquivo definitivo.
+    Leitores nunca enxergam uma partição pela metade.
+    """
+
+    caminho = caminho_particao(ano, mes, diretorio)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+
+    descritor, temporario = tempfile.mkstemp(
+        dir=caminho.parent,
+        suffix=".tmp"
+    )
+    os.close(descritor)
+
+    try:
+        tipar_movimentos(df).to_parquet(
+            temporario,
+            index=False
+        )
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def invalidar_particao(ano, mes, diretorio=None):
+    """
+    Remove somente a partição (ano, mês) informada.
+    """
+
+    caminho = caminho_particao(ano, mes, diretorio)
+
+    if caminho.exists():
+        caminho.unlink()
+
+
+def limpar_cache_movimentos(diretorio=None):
+    """
+    Remove todas as partições gravadas em disco.
+    """
+
+    base = Path(diretorio or DIRETORIO_CACHE_MOVIMENTOS)
+
+    if base.exists():
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def preparar_particoes(
+    periodos,
+    buscar_mes,
+    diretorio=None
+):
+    """
+    Garante em disco as partições dos períodos [(ano, mes), ...].
+
+    Os meses ausentes são buscados em paralelo com buscar_mes(ano, mes)
+    e gravados como novas partições. Devolve {(ano, mes): DataFrame}
+    somente para os meses que precisaram ser buscados.
+    Uma falha ao gravar não impede a leitura: o dado buscado
+    é usado normalmente e a partição é tentada de novo na próxima vez.
+
+    A versão de cada partição é lida antes da busca: se a partição
+    for invalidada enquanto a busca corre (uma importação do mês),
+    o resultado já é antigo e não é gravado em disco.
+    """
+
+    faltantes = []
+
+    for ano, mes in periodos:
+        chave = (int(ano), int(mes))
+
+        if chave not in faltantes and not caminho_particao(*chave, diretorio).exists():
+            faltantes.append(chave)
+
+    if not faltantes:
+        return {}
+
+    versoes = {
+        chave: versao_dependencias(TABELA_MOVIMENTOS, [chave])
+        for chave in faltantes
+    }
+
+    resultados = executar_em_paralelo(
+        [
+            (lambda ano=ano, mes=mes: tipar_movimentos(buscar_mes(ano, mes)))
+            for ano, mes in faltantes
+        ]
+    )
+
+    buscados = {}
+
+    for (ano, mes), df_mes in zip(faltantes, resultados):
+        buscados[(ano, mes)] = df_mes
+
+        def versao_mudou():
+            return versao_dependencias(TABELA_MOVIMENTOS, [(ano, mes)]) != versoes[(ano, mes)]
+
+        if versao_mudou():
+            continue
+
+        try:
+            gravar_particao(ano, mes, df_mes, diretorio)
+
+            # Invalidada durante a gravação: o arquivo recém-escrito
+            # também é antigo e sai do disco.
+            if versao_mudou():
+                invalidar_particao(ano, mes, diretorio)
+        except Exception:
+            pass
+
+    return buscados
+
+
+def ler_movimentos_com_cache(
+    ano,
+    meses_numeros,
+    buscar_mes,
+    diretorio=None
+):
+    """
+    Lê os meses informados a partir das partições em disco,
+    buscando antes, em paralelo, os meses que ainda não existem.
+    O resultado segue sempre a ordem de meses_numeros.
+    """
+
+    buscados = preparar_particoes(
+        [(ano, mes) for mes in meses_numeros],
+        buscar_mes,
+        diretorio
+    )
+
+    partes = []
+
+    for mes in meses_numeros:
+        df_mes = buscados.get((int(ano), int(mes)))
+
+        if df_mes is None:
+            df_mes = ler_particao(ano, mes, diretorio)
+
+        if df_mes is None:
+            df_mes = tipar_movimentos(
+                buscar_mes(int(ano), int(mes))
+            )
+
+        if not df_mes.empty:
+            partes.append(df_mes)
+
+    if not partes:
+        return pd.DataFrame()
+
+    return pd.concat(partes, ignore_index=True)
@@ -0,0 +1,733 @@
+import calendar
+import hashlib
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from servico_busca_supabase import (
+    MAX_REQUISICOES_SIMULTANEAS,
+    buscar_todos_keyset,
+    executar_com_retentativa,
+    executar_em_paralelo,
+)
+from servico_indice_movimentos import ler_digest_periodo
+from servico_validacao_importacao import descrever_linhas
+
+
+# Colunas da exportação do ERP usadas na carga de movimentos.
+COLUNAS_OBRIGATORIAS_CARGA = [
+    "Data Baixa",
+    "Valor Baixado",
+    "Pag/Rec",
+    "C. Resultado",
+    "Centro de Custo",
+]
+
+# Linhas da planilha lidas e preparadas por vez.
+TAMANHO_BLOCO_CARGA = 5000
+
+TAMANHO_LOTE_INSERCAO = 500
+
+# Meses gravados ao mesmo tempo na carga em lote; cada um já
+# envia seus próprios lotes em paralelo ao staging.
+MAX_PERIODOS_SIMULTANEOS = 2
+
+COLUNAS_MOVIMENTOS = [
+    "data",
+    "ano",
+    "mes",
+    "conta_id",
+    "centro_custo",
+    "valor",
+]
+
+# Cada lançamento gravado leva o hash do seu conteúdo, para que uma
+# nova carga do mesmo mês aplique só a diferença:
+#
+# alter table movimentos_financeiros add column linha_hash text;
+# create index on movimentos_financeiros (ano, mes, linha_hash);
+
+# Troca atômica do mês: os lotes vão primeiro para a tabela de
+# staging, marcados com o id da carga, e a função abaixo substitui
+# o mês em movimentos_financeiros numa única transação. Leitores
+# veem o mês antigo ou o novo, nunca um mês pela metade.
+TABELA_STAGING = "movimentos_financeiros_staging"
+FUNCAO_TROCAR_MES = "trocar_mes_movimentos"
+
+SQL_TABELA_STAGING = """
+create table movimentos_financeiros_staging (
+    carga_id text not null,
+    linha integer not null,
+    linha_hash text,
+    data date,
+    ano integer not null,
+    mes text not null,
+    conta_id text,
+    centro_custo text,
+    valor numeric,
+    primary key (carga_id, linha)
+)
+"""
+
+SQL_FUNCAO_TROCAR_MES = """
+create or replace function trocar_mes_movimentos(
+    p_ano integer,
+    p_mes text,
+    p_carga text,
+    p_quantidade integer
+) returns integer
+language plpgsql
+as $$
+declare
+    v_total integer;
+begin
+    delete from movimentos_financeiros
+    where ano = p_ano and mes = p_mes;
+
+    insert into movimentos_financeiros (data, ano, mes, conta_id, centro_custo, valor, linha_hash)
+    select data, ano, mes, conta_id, centro_custo, valor, linha_hash
+    from movimentos_financeiros_staging
+    where carga_id = p_carga
+    order by linha;
+
+    get diagnostics v_total = row_count;
+
+    if v_total <> p_quantidade then
+        raise exception 'Carga % incompleta: % de % linhas no staging',
+            p_carga, v_total, p_quantidade;
+    end if;
+
+    delete from movimentos_financeiros_staging
+    where carga_id = p_carga;
+
+    return v_total;
+end;
+$$
+"""
+
+# Mesma troca atômica, mas só com a diferença: remove do mês as
+# linhas cujo hash não está na nova carga e insere as do staging.
+FUNCAO_APLICAR_DIFERENCA = "aplicar_diferenca_mes"
+
+SQL_FUNCAO_APLICAR_DIFERENCA = """
+create or replace function aplicar_diferenca_mes(
+    p_ano integer,
+    p_mes text,
+    p_carga text,
+    p_quantidade integer,
+    p_remover text[]
+) returns integer
+language plpgsql
+as $$
+declare
+    v_removidas integer;
+    v_inseridas integer;
+begin
+    delete from movimentos_financeiros
+    where ano = p_ano and mes = p_mes and linha_hash = any(p_remover);
+
+    get diagnostics v_removidas = row_count;
+
+    if v_removidas <> coalesce(array_length(p_remover, 1), 0) then
+        raise exception 'Mês %/% mudou durante a carga %', p_mes, p_ano, p_carga;
+    end if;
+
+    insert into movimentos_financeiros (data, ano, mes, conta_id, centro_custo, valor, linha_hash)
+    select data, ano, mes, conta_id, centro_custo, valor, linha_hash
+    from movimentos_financeiros_staging
+    where carga_id = p_carga
+    order by linha;
+
+    get diagnostics v_inseridas = row_count;
+
+    if v_inseridas <> p_quantidade then
+        raise exception 'Carga % incompleta: % de % linhas no staging',
+            p_carga, v_inseridas, p_quantidade;
+    end if;
+
+    delete from movimentos_financeiros_staging
+    where carga_id = p_carga;
+
+    return v_inseridas;
+end;
+$$
+"""
+
+
+def _nomes_colunas(cabecalho):
+    return [
+        f"Unnamed: {i}" if valor is None else str(valor).strip()
+        for i, valor in enumerate(cabecalho)
+    ]
+
+
+def ler_excel_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO_CARGA):
+    """
+    Lê a primeira aba do Excel em blocos de `tamanho_bloco` linhas,
+    com o openpyxl em modo somente leitura: a planilha nunca fica
+    inteira na memória.
+
+    A primeira linha é o cabeçalho. Cada bloco é um DataFrame
+    indexado pelo número da linha no Excel; linhas vazias são
+    ignoradas, como no pd.read_excel. Uma planilha sem dados gera
+    um único bloco vazio, para que as colunas ainda sejam validadas.
+    """
+
+    livro = load_workbook(
+        arquivo,
+        read_only=True,
+        data_only=True
+    )
+
+    try:
+        planilha = livro.worksheets[0]
+
+        # O modo somente leitura para no tamanho gravado na tag
+        # <dimension>, que alguns exports do ERP gravam errado; sem o
+        # reset, as linhas além dele seriam perdidas em silêncio.
+        planilha.reset_dimensions()
+        linhas = planilha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+
+        if cabecalho is None:
+            yield pd.DataFrame()
+            return
+
+        colunas = _nomes_colunas(cabecalho)
+        bloco = []
+        numeros = []
+        gerou_bloco = False
+
+        # Linha 1 é o cabeçalho; os dados começam na linha 2.
+        for numero, linha in enumerate(linhas, start=2):
+            if all(valor is None for valor in linha):
+                continue
+
+            bloco.append(tuple(linha[:len(colunas)]))
+            numeros.append(numero)
+
+            if len(bloco) >= tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=colunas, index=numeros)
+                gerou_bloco = True
+                bloco = []
+                numeros = []
+
+        if bloco or not gerou_bloco:
+            yield pd.DataFrame(bloco, columns=colunas, index=numeros)
+    finally:
+        livro.close()
+
+
+def _texto_celulas(serie):
+    """
+    Texto das células sem espaços nas pontas. Células vazias (None do
+    openpyxl ou NaN do pandas) viram "", em qualquer versão do pandas,
+    em vez de "None" ou "nan".
+    """
+
+    return (
+        serie
+        .astype(object)
+        .where(serie.notna(), "")
+        .astype(str)
+        .str.strip()
+    )
+
+
+def preparar_bloco_movimentos(df_bloco, ano_ref=None, mes_num=None, mes_ref_nome=None):
+    """
+    Prepara um bloco da exportação do ERP no formato da tabela
+    movimentos_financeiros (data, ano, mes, conta_id, centro_custo, valor).
+
+    - Todas as linhas precisam ter Data Baixa dentro do mês de referência
+    - Sem ano_ref e mes_num (carga em lote), ano e mês de cada linha
+      vêm da própria Data Baixa, que só precisa ser uma data válida
+    - Lançamentos de "baixa vinculo" são descartados
+    - Pagamentos ("P" em Pag/Rec) ficam negativos
+
+    Erros de validação citam as linhas do Excel (índice do bloco).
+    """
+
+    df = df_bloco.copy()
+    df.columns = [str(c).strip() for c in df.columns]
+
+    faltantes = [c for c in COLUNAS_OBRIGATORIAS_CARGA if c not in df.columns]
+    if faltantes:
+        raise ValueError(f"Colunas obrigatórias ausentes no Excel: {faltantes}")
+
+    datas = pd.to_datetime(df["Data Baixa"], errors="coerce")
+
+    if ano_ref is None or mes_num is None:
+        sem_data = datas.isna()
+
+        if sem_data.any():
+            raise ValueError(
+                f"Carga abortada: existem {int(sem_data.sum())} linhas sem Data Baixa válida "
+                f"(linhas {descrever_linhas(df.index[sem_data])})."
+            )
+    else:
+        ano_ref = int(ano_ref)
+        mes_num = int(mes_num)
+        rotulo = f"{mes_ref_nome or mes_num}/{ano_ref}"
+
+        data_inicio = datetime(ano_ref, mes_num, 1)
+        data_fim = datetime(ano_ref, mes_num, calendar.monthrange(ano_ref, mes_num)[1])
+
+        fora = datas.isna() | (datas < data_inicio) | (datas > data_fim)
+
+        if fora.any():
+            raise ValueError(
+                f"Carga abortada: existem {int(fora.sum())} linhas fora de {rotulo} "
+                f"pela Data Baixa (linhas {descrever_linhas(df.index[fora])})."
+            )
+
+    if "Histórico" in df.columns:
+        manter = ~df["Histórico"].astype(str).str.contains("baixa vinculo", case=False, na=False)
+        df = df[manter]
+        datas = datas[manter]
+
+    valores = pd.to_numeric(df["Valor Baixado"], errors="coerce")
+    invalidos = valores.isna() & df["Valor Baixado"].notna()
+
+    if invalidos.any():
+        raise ValueError(
+            f"Carga abortada: Valor Baixado não numérico "
+            f"(linhas {descrever_linhas(df.index[invalidos])})."
+        )
+
+    pagamento = df["Pag/Rec"].astype(str).str.strip().str.upper() == "P"
+
+    return pd.DataFrame({
+        "data": datas.dt.strftime("%Y-%m-%d"),
+        "ano": datas.dt.year.astype(int) if ano_ref is None else ano_ref,
+        "mes": datas.dt.month.astype(str) if mes_num is None else str(mes_num),
+        "conta_id": _texto_celulas(df["C. Resultado"]).str.split(" ").str[0].str.strip(),
+        "centro_custo": _texto_celulas(df["Centro de Custo"]),
+        "valor": np.where(pagamento, -valores.astype(float), valores.astype(float)),
+    }, index=df.index)
+
+
+def gerar_lotes_movimentos(
+    arquivo,
+    ano_ref=None,
+    mes_num=None,
+    mes_ref_nome=None,
+    tamanho_bloco=TAMANHO_BLOCO_CARGA,
+    origem=None
+):
+    """
+    Gera, bloco a bloco, os lançamentos prontos para o Supabase
+    a partir do Excel do ERP. Cada bloco é validado ao ser lido;
+    um bloco inválido interrompe a geração com ValueError.
+
+    Com `origem` (nome do arquivo, na carga de vários arquivos), as
+    linhas passam a ser identificadas como "arquivo:linha" e os erros
+    citam o arquivo.
+    """
+
+    for df_bloco in ler_excel_em_blocos(arquivo, tamanho_bloco):
+        if origem:
+            df_bloco.index = [f"{origem}:{numero}" for numero in df_bloco.index]
+
+        try:
+            yield preparar_bloco_movimentos(
+                df_bloco,
+                ano_ref,
+                mes_num,
+                mes_ref_nome
+            )
+        except ValueError as erro:
+            # Erros sem linhas (ex.: colunas ausentes) não citariam o arquivo.
+            if not origem or f"{origem}:" in str(erro):
+                raise
+            raise ValueError(f"{origem}: {erro}") from erro
+
+
+def preparar_movimentos_para_supabase(df_carga, ano_ref=None, mes_num=None, mes_ref_nome=None):
+    """
+    Versão para um DataFrame já lido por inteiro.
+    """
+
+    return preparar_bloco_movimentos(
+        df_carga,
+        ano_ref,
+        mes_num,
+        mes_ref_nome
+    ).reset_index(drop=True)
+
+
+def juntar_lotes_movimentos(lotes):
+    """
+    Junta os blocos gerados em um único DataFrame, preservando
+    o número da linha do Excel como índice.
+    """
+
+    lotes = [lote for lote in lotes if not lote.empty]
+
+    if not lotes:
+        return pd.DataFrame(columns=COLUNAS_MOVIMENTOS)
+
+    return pd.concat(lotes)
+
+
+def separar_por_periodo(df_mov):
+    """
+    Divide os lançamentos em {(ano, mes): DataFrame}, em ordem
+    cronológica. Cada partição substitui um mês inteiro.
+    """
+
+    if df_mov is None or df_mov.empty:
+        return {}
+
+    return {
+        (int(ano), int(mes)): grupo
+        for (ano, mes), grupo in df_mov.groupby(
+            [df_mov["ano"].astype(int), df_mov["mes"].astype(int)]
+        )
+    }
+
+
+def _registros_staging(lotes, carga_id, tamanho_lote):
+    """
+    Quebra os blocos de lançamentos em lotes de registros do
+    staging, numerando as linhas da carga em sequência.
+    """
+
+    linha = 0
+
+    for df_lote in lotes:
+        if df_lote is None or df_lote.empty:
+            continue
+
+        colunas = COLUNAS_MOVIMENTOS + (
+            ["linha_hash"] if "linha_hash" in df_lote.columns else []
+        )
+
+        registros = df_lote[colunas].to_dict(orient="records")
+
+        for registro in registros:
+            registro["carga_id"] = carga_id
+            registro["linha"] = linha
+            linha += 1
+
+        for i in range(0, len(registros), tamanho_lote):
+            yield registros[i:i + tamanho_lote]
+
+
+def gravar_staging(
+    supabase_client,
+    lotes,
+    carga_id,
+    tamanho_lote=TAMANHO_LOTE_INSERCAO,
+    max_simultaneas=MAX_REQUISICOES_SIMULTANEAS
+):
+    """
+    Envia os lotes ao staging em paralelo e em fluxo: novos lotes
+    são preparados enquanto os anteriores ainda estão sendo gravados,
+    com no máximo 2 × max_simultaneas lotes em espera.
+
+    Cada lote é um upsert pela chave (carga_id, linha), então uma
+    nova tentativa após falha de rede não duplica linhas.
+    Devolve a quantidade de linhas enviadas.
+    """
+
+    def enviar(registros):
+        executar_com_retentativa(
+            lambda: (
+                supabase_client
+                .table(TABELA_STAGING)
+                .upsert(registros, on_conflict="carga_id,linha")
+                .execute()
+            )
+        )
+        return len(registros)
+
+    total = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_simultaneas)) as executor:
+        pendentes = set()
+
+        for registros in _registros_staging(lotes, carga_id, tamanho_lote):
+            pendentes.add(executor.submit(enviar, registros))
+
+            if len(pendentes) >= 2 * max_simultaneas:
+                concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                total += sum(futuro.result() for futuro in concluidos)
+
+        total += sum(futuro.result() for futuro in pendentes)
+
+    return total
+
+
+def descartar_staging(supabase_client, carga_id):
+    (
+        supabase_client
+        .table(TABELA_STAGING)
+        .delete()
+        .eq("carga_id", carga_id)
+        .execute()
+    )
+
+
+def _gravar_e_trocar(supabase_client, lotes, funcao, parametros):
+    """
+    Grava os lotes no staging e chama `funcao` no banco para publicá-los.
+    Se algo falhar antes da troca, o staging da carga é descartado
+    e o mês publicado continua intacto.
+    """
+
+    if isinstance(lotes, pd.DataFrame):
+        lotes = [lotes]
+
+    carga_id = uuid.uuid4().hex
+
+    try:
+        quantidade = gravar_staging(supabase_client, lotes, carga_id)
+
+        resposta = (
+            supabase_client
+            .rpc(
+                funcao,
+                {
+                    **parametros,
+                    "p_carga": carga_id,
+                    "p_quantidade": int(quantidade),
+                }
+            )
+            .execute()
+        )
+    except Exception:
+        try:
+            descartar_staging(supabase_client, carga_id)
+        except Exception:
+            pass
+        raise
+
+    return int(resposta.data) if resposta.data is not None else quantidade
+
+
+def substituir_mes_movimentos(supabase_client, lotes, ano, mes_num):
+    """
+    Substitui o mês (ano, mes_num) de movimentos_financeiros pelos
+    lançamentos de `lotes` (DataFrame ou iterável de DataFrames).
+
+    Os lotes são gravados no staging e só então trocados pelo mês
+    atual com uma única chamada à função trocar_mes_movimentos.
+    Devolve a quantidade de linhas gravadas.
+    """
+
+    return _gravar_e_trocar(
+        supabase_client,
+        lotes,
+        FUNCAO_TROCAR_MES,
+        {
+            "p_ano": int(ano),
+            "p_mes": str(int(mes_num)),
+        }
+    )
+
+
+def calcular_hashes_linhas(df_mov):
+    """
+    Hash (sha1) do conteúdo de cada lançamento. Linhas idênticas
+    recebem hashes diferentes pela ordem de ocorrência, então o
+    conjunto de hashes representa o mês inteiro, repetições inclusive.
+    """
+
+    if df_mov is None or df_mov.empty:
+        return pd.Series(dtype=object)
+
+    conteudo = df_mov[COLUNAS_MOVIMENTOS[0]].astype(str)
+
+    for coluna in COLUNAS_MOVIMENTOS[1:]:
+        conteudo = conteudo + "|" + df_mov[coluna].astype(str)
+
+    ocorrencia = conteudo.groupby(conteudo, sort=False).cumcount().astype(str)
+
+    return pd.Series(
+        [
+            hashlib.sha1(texto.encode("utf-8")).hexdigest()
+            for texto in conteudo + "|" + ocorrencia
+        ],
+        index=df_mov.index,
+        dtype=object
+    )
+
+
+def calcular_digest(hashes_linhas):
+    """
+    Impressão digital da carga inteira: não depende
+    da ordem das linhas no Excel.
+    """
+
+    return hashlib.sha1(
+        "\n".join(sorted(hashes_linhas)).encode("utf-8")
+    ).hexdigest()
+
+
+def ler_hashes_mes(supabase_client, ano, mes_num):
+    """
+    Hashes dos lançamentos gravados no mês. None quando alguma
+    linha ainda não tem hash (gravada antes do linha_hash).
+    """
+
+    registros = buscar_todos_keyset(
+        lambda: (
+            supabase_client
+            .table("movimentos_financeiros")
+            .select("id,linha_hash")
+            .eq("ano", int(ano))
+            .eq("mes", str(int(mes_num)))
+        )
+    )
+
+    hashes = [registro.get("linha_hash") for registro in registros]
+
+    if any(h is None for h in hashes):
+        return None
+
+    return hashes
+
+
+def importar_mes_movimentos(supabase_client, df_mov, ano, mes_num):
+    """
+    Grava o mês importado escrevendo o mínimo possível.
+
+    - Mesma impressão digital da última carga, ou nenhuma linha
+      diferente das gravadas: nada é gravado
+    - Diferença menor que o mês: só as linhas removidas e as novas
+      são aplicadas, numa troca atômica (aplicar_diferenca_mes)
+    - Caso contrário: o mês inteiro é trocado (trocar_mes_movimentos)
+
+    Devolve {"situacao": "inalterado" | "diferenca" | "substituido",
+    "digest", "inseridas", "removidas"}.
+    """
+
+    df = df_mov.assign(linha_hash=calcular_hashes_linhas(df_mov))
+    digest = calcular_digest(df["linha_hash"])
+
+    resultado = {
+        "situacao": "inalterado",
+        "digest": digest,
+        "inseridas": 0,
+        "removidas": 0,
+    }
+
+    if ler_digest_periodo(supabase_client, ano, mes_num) == digest:
+        return resultado
+
+    atuais = ler_hashes_mes(supabase_client, ano, mes_num)
+
+    if atuais:
+        atuais = set(atuais)
+        remover = sorted(atuais - set(df["linha_hash"]))
+        inserir = df[~df["linha_hash"].isin(atuais)]
+
+        # Nenhuma linha diferente das gravadas (ex.: mês sem digest
+        # no índice): nada a gravar, nem cache ou cubo a refazer.
+        if not remover and inserir.empty:
+            return resultado
+
+        if len(remover) + len(inserir) < len(df):
+            resultado.update(
+                situacao="diferenca",
+                inseridas=len(inserir),
+                removidas=len(remover),
+            )
+
+            _gravar_e_trocar(
+                supabase_client,
+                inserir,
+                FUNCAO_APLICAR_DIFERENCA,
+                {
+                    "p_ano": int(ano),
+                    "p_mes": str(int(mes_num)),
+                    "p_remover": remover,
+                }
+            )
+
+            return resultado
+
+    resultado.update(
+        situacao="substituido",
+        inseridas=substituir_mes_movimentos(supabase_client, df, ano, mes_num),
+        removidas=len(atuais) if atuais else 0,
+    )
+
+    return resultado
+
+
+def periodos_parciais(df_mov):
+    """
+    Meses das pontas da carga (o primeiro e o último) cujas datas não
+    chegam ao início ou ao fim do mês: indício de exportação cortada
+    no meio do mês, que substituiria o mês inteiro por uma parte dele.
+
+    Devolve [(ano, mes, primeira_data, ultima_data), ...].
+    """
+
+    particoes = separar_por_periodo(df_mov)
+
+    if not particoes:
+        return []
+
+    periodos = sorted(particoes)
+    pontas = {periodos[0], periodos[-1]}
+    parciais = []
+
+    for ano, mes in sorted(pontas):
+        datas = pd.to_datetime(particoes[(ano, mes)]["data"], errors="coerce")
+        primeira = datas.min()
+        ultima = datas.max()
+        ultimo_dia = calendar.monthrange(ano, mes)[1]
+
+        inicio_cortado = (ano, mes) == periodos[0] and primeira.day > 1
+        fim_cortado = (ano, mes) == periodos[-1] and ultima.day < ultimo_dia
+
+        if inicio_cortado or fim_cortado:
+            parciais.append((ano, mes, primeira.date(), ultima.date()))
+
+    return parciais
+
+
+def importar_periodos_movimentos(
+    supabase_client,
+    particoes,
+    max_simultaneas=MAX_PERIODOS_SIMULTANEOS
+):
+    """
+    Importa vários meses ({(ano, mes): DataFrame}) ao mesmo tempo,
+    cada um com importar_mes_movimentos.
+
+    Um mês que falha não interrompe os outros: o resultado é
+    {(ano, mes): resultado da importação ou a exceção ocorrida}.
+    """
+
+    periodos = sorted(particoes)
+
+    def tarefa(periodo):
+        def executar():
+            try:
+                return importar_mes_movimentos(
+                    supabase_client,
+                    particoes[periodo],
+                    *periodo
+                )
+            except Exception as erro:
+                return erro
+
+        return executar
+
+    return dict(
+        zip(
+            periodos,
+            executar_em_paralelo(
+                [tarefa(periodo) for periodo in periodos],
+                max_simultaneas=max_simultaneas
+            )
+        )
+    )
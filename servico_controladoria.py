@@ -1,5 +1,9 @@
+from functools import cached_property
+
 import pandas as pd
 
+from servico_rateio import calcular_resultado_centros, simular_cenarios_rateio
+
 
 def _numero(valor):
     return pd.to_numeric(
@@ -8,6 +12,13 @@ def _numero(valor):
     ).fillna(0.0)
 
 
+# Prefixo da conta de nível 2 → série mensal.
+GRUPOS_SERIES_MENSAIS = {
+    "01": "Receita",
+    "02": "Despesa",
+}
+
+
 def preparar_base_controladoria(
     df_bi,
     meses_selecionados
@@ -55,237 +66,440 @@ def preparar_base_controladoria(
     return df
 
 
-def calcular_resumo_financeiro(
-    df_bi,
-    meses_selecionados
-):
+class ControladoriaSnapshot:
     """
-    Calcula os principais indicadores financeiros
-    com base na hierarquia do plano de contas.
+    Indicadores da controladoria calculados a partir de uma
+    única base preparada.
+
+    preparar_base_controladoria() roda uma vez no construtor;
+    resumo, séries mensais, maiores contas e alertas são derivados
+    dessa mesma base e guardados na primeira vez em que são pedidos.
+    Painel Executivo e Analista IA usam o mesmo snapshot.
 
     Premissas:
     01 = receitas
     02 = despesas
     """
 
-    df = preparar_base_controladoria(
+    def __init__(
+        self,
         df_bi,
         meses_selecionados
-    )
+    ):
+        self.meses = list(meses_selecionados)
 
-    if df.empty:
-        return {
-            "receita": 0.0,
-            "despesas": 0.0,
-            "resultado": 0.0,
-            "margem": 0.0
-        }
+        self.base = preparar_base_controladoria(
+            df_bi,
+            self.meses
+        )
 
-    # Usa nível 2 para evitar dupla contagem.
-    nivel_2 = df[
-        df["Nivel"] == 2
-    ].copy()
+    @cached_property
+    def _nivel_2(self):
+        # Usa nível 2 para evitar dupla contagem.
+        if self.base.empty:
+            return self.base
 
-    receita = (
-        nivel_2[
-            nivel_2["Conta"]
-            .astype(str)
-            .str.startswith("01")
-        ]["ACUMULADO_CONTROLADORIA"]
-        .sum()
-    )
+        return self.base[
+            self.base["Nivel"] == 2
+        ]
+
+    @cached_property
+    def _analiticas(self):
+        """
+        Contas analíticas com movimento, da maior para a menor
+        em valor absoluto.
+        """
+
+        if self.base.empty:
+            return pd.DataFrame()
+
+        analiticas = self.base[
+            self.base["Nivel"] >= 4
+        ].copy()
+
+        analiticas[
+            "VALOR_ABSOLUTO"
+        ] = (
+            analiticas[
+                "ACUMULADO_CONTROLADORIA"
+            ].abs()
+        )
+
+        return (
+            analiticas[
+                analiticas[
+                    "VALOR_ABSOLUTO"
+                ] > 0
+            ]
+            .sort_values(
+                "VALOR_ABSOLUTO",
+                ascending=False
+            )
+        )
+
+    @cached_property
+    def series_mensais(self):
+        """
+        Receita, Despesa, Resultado e Margem por mês em uma
+        única tabela, com uma só soma agrupada sobre os meses.
+        """
+
+        if self.base.empty:
+            return pd.DataFrame()
 
-    despesas = (
-        nivel_2[
+        nivel_2 = self._nivel_2
+
+        grupos = (
             nivel_2["Conta"]
-            .astype(str)
-            .str.startswith("02")
-        ]["ACUMULADO_CONTROLADORIA"]
-        .sum()
-    )
+            .str[:2]
+            .map(GRUPOS_SERIES_MENSAIS)
+        )
 
-    resultado = receita + despesas
+        somas = (
+            nivel_2[self.meses]
+            .groupby(grupos)
+            .sum()
+            .reindex(list(GRUPOS_SERIES_MENSAIS.values()), fill_value=0.0)
+            .T
+        )
 
-    margem = (
-        resultado / receita * 100
-        if receita != 0
-        else 0.0
-    )
+        receita = somas["Receita"].astype(float)
+        resultado = receita + somas["Despesa"].astype(float)
 
-    return {
-        "receita": float(receita),
-        "despesas": float(despesas),
-        "resultado": float(resultado),
-        "margem": float(margem)
-    }
+        margem = (
+            resultado
+            .div(receita.where(receita != 0))
+            .mul(100)
+            .fillna(0.0)
+        )
 
+        return pd.DataFrame({
+            "Mês": self.meses,
+            "Receita": receita.to_numpy(),
+            "Despesa": somas["Despesa"].astype(float).to_numpy(),
+            "Resultado": resultado.to_numpy(),
+            "Margem": margem.to_numpy(),
+        })
 
-def calcular_receita_mensal(
-    df_bi,
-    meses_selecionados
-):
-    """
-    Série mensal de receitas.
-    """
+    def _serie_mensal(self, coluna, nome=None):
+        series = self.series_mensais
 
-    df = preparar_base_controladoria(
-        df_bi,
-        meses_selecionados
-    )
+        if series.empty:
+            return pd.DataFrame()
 
-    if df.empty:
-        return pd.DataFrame()
+        return series[["Mês", coluna]].rename(
+            columns={coluna: nome or coluna}
+        )
 
-    nivel_2 = df[
-        df["Nivel"] == 2
-    ].copy()
+    @cached_property
+    def resumo(self):
+        if self.base.empty:
+            return {
+                "receita": 0.0,
+                "despesas": 0.0,
+                "resultado": 0.0,
+                "margem": 0.0
+            }
 
-    registros = []
+        nivel_2 = self._nivel_2
 
-    for mes in meses_selecionados:
-        valor = (
+        receita = (
             nivel_2[
                 nivel_2["Conta"]
-                .astype(str)
                 .str.startswith("01")
-            ][mes]
+            ]["ACUMULADO_CONTROLADORIA"]
             .sum()
         )
 
-        registros.append({
-            "Mês": mes,
-            "Valor": float(valor)
-        })
+        despesas = (
+            nivel_2[
+                nivel_2["Conta"]
+                .str.startswith("02")
+            ]["ACUMULADO_CONTROLADORIA"]
+            .sum()
+        )
 
-    return pd.DataFrame(registros)
+        resultado = receita + despesas
 
+        margem = (
+            resultado / receita * 100
+            if receita != 0
+            else 0.0
+        )
 
-def calcular_despesa_mensal(
-    df_bi,
-    meses_selecionados
-):
-    """
-    Série mensal de despesas.
-    """
+        return {
+            "receita": float(receita),
+            "despesas": float(despesas),
+            "resultado": float(resultado),
+            "margem": float(margem)
+        }
 
-    df = preparar_base_controladoria(
-        df_bi,
-        meses_selecionados
-    )
+    @cached_property
+    def receita_mensal(self):
+        return self._serie_mensal("Receita", "Valor")
 
-    if df.empty:
-        return pd.DataFrame()
+    @cached_property
+    def despesa_mensal(self):
+        return self._serie_mensal("Despesa", "Valor")
 
-    nivel_2 = df[
-        df["Nivel"] == 2
-    ].copy()
+    @cached_property
+    def resultado_mensal(self):
+        return self._serie_mensal("Resultado")
 
-    registros = []
+    @cached_property
+    def margem_mensal(self):
+        return self._serie_mensal("Margem")
 
-    for mes in meses_selecionados:
-        valor = (
-            nivel_2[
-                nivel_2["Conta"]
-                .astype(str)
-                .str.startswith("02")
-            ][mes]
-            .sum()
+    def top_contas_analiticas(self, quantidade=10):
+        """
+        Maiores contas analíticas por valor absoluto.
+        """
+
+        return self._analiticas.head(quantidade)
+
+    def top_contas_receita(self, quantidade=10):
+        """
+        Maiores contas de receita.
+        """
+
+        df = self._analiticas
+
+        if df.empty:
+            return pd.DataFrame()
+
+        return (
+            df[
+                df["Conta"]
+                .str.startswith("01")
+            ]
+            .sort_values(
+                "ACUMULADO_CONTROLADORIA",
+                ascending=False
+            )
+            .head(quantidade)
         )
 
-        registros.append({
-            "Mês": mes,
-            "Valor": float(valor)
-        })
+    def top_contas_despesa(self, quantidade=10):
+        """
+        Maiores contas de despesa.
+        """
 
-    return pd.DataFrame(registros)
+        df = self._analiticas
 
+        if df.empty:
+            return pd.DataFrame()
 
-def calcular_resultado_mensal(
+        df = df[
+            df["Conta"]
+            .str.startswith("02")
+        ].copy()
+
+        df["ABS_DESPESA"] = (
+            df[
+                "ACUMULADO_CONTROLADORIA"
+            ].abs()
+        )
+
+        return (
+            df
+            .sort_values(
+                "ABS_DESPESA",
+                ascending=False
+            )
+            .head(quantidade)
+        )
+
+    @cached_property
+    def alertas(self):
+        """
+        Alertas simples, objetivos e auditáveis.
+        """
+
+        alertas = []
+
+        resumo = self.resumo
+
+        if resumo["resultado"] < 0:
+            alertas.append({
+                "nivel": "critico",
+                "titulo": "Resultado negativo",
+                "mensagem": (
+                    "O período selecionado apresenta "
+                    "prejuízo acumulado."
+                )
+            })
+
+        if resumo["receita"] > 0:
+            percentual_despesas = (
+                abs(
+                    resumo["despesas"]
+                )
+                / resumo["receita"]
+                * 100
+            )
+
+            if percentual_despesas > 90:
+                alertas.append({
+                    "nivel": "atencao",
+                    "titulo": (
+                        "Despesas consumindo grande "
+                        "parte da receita"
+                    ),
+                    "mensagem": (
+                        f"As despesas representam "
+                        f"{percentual_despesas:.2f}% "
+                        "das receitas."
+                    )
+                })
+
+        if resumo["margem"] < 5:
+            alertas.append({
+                "nivel": "atencao",
+                "titulo": "Margem reduzida",
+                "mensagem": (
+                    f"A margem acumulada está em "
+                    f"{resumo['margem']:.2f}%."
+                )
+            })
+
+        top_despesas = self.top_contas_despesa(
+            quantidade=5
+        )
+
+        for descricao, valor in zip(
+            top_despesas.get("Descrição", []),
+            top_despesas.get("ACUMULADO_CONTROLADORIA", [])
+        ):
+            alertas.append({
+                "nivel": "informacao",
+                "titulo": str(descricao),
+                "mensagem": (
+                    "Conta relevante no período: "
+                    f"{float(valor):.2f}"
+                )
+            })
+
+        return alertas
+
+    def contexto_diretoria(self):
+        """
+        Estrutura consolidada usada tanto pelo Painel
+        Executivo quanto pelo Analista IA.
+        """
+
+        def converter_linhas(df):
+            if df is None or df.empty:
+                return []
+
+            return [
+                {
+                    "conta": str(conta),
+                    "descricao": str(descricao),
+                    "valor": float(valor)
+                }
+                for conta, descricao, valor in zip(
+                    df["Conta"],
+                    df["Descrição"],
+                    df["ACUMULADO_CONTROLADORIA"]
+                )
+            ]
+
+        return {
+            "resumo": self.resumo,
+            "top_receitas": converter_linhas(
+                self.top_contas_receita(10)
+            ),
+            "top_despesas": converter_linhas(
+                self.top_contas_despesa(10)
+            ),
+            "alertas": self.alertas
+        }
+
+
+def calcular_series_mensais(
     df_bi,
     meses_selecionados
 ):
     """
-    Série mensal de resultado.
+    Séries mensais de receita, despesa, resultado e margem
+    em uma única tabela (Mês, Receita, Despesa, Resultado, Margem).
     """
 
-    receitas = calcular_receita_mensal(
+    return ControladoriaSnapshot(
         df_bi,
         meses_selecionados
-    )
+    ).series_mensais
+
 
-    despesas = calcular_despesa_mensal(
+def calcular_resumo_financeiro(
+    df_bi,
+    meses_selecionados
+):
+    """
+    Calcula os principais indicadores financeiros
+    com base na hierarquia do plano de contas.
+    """
+
+    return ControladoriaSnapshot(
         df_bi,
         meses_selecionados
-    )
-
-    if receitas.empty:
-        return pd.DataFrame()
+    ).resumo
 
-    resultado = receitas.merge(
-        despesas,
-        on="Mês",
-        suffixes=(
-            "_Receita",
-            "_Despesa"
-        )
-    )
 
-    resultado["Resultado"] = (
-        resultado["Valor_Receita"]
-        + resultado["Valor_Despesa"]
-    )
+def calcular_receita_mensal(
+    df_bi,
+    meses_selecionados
+):
+    """
+    Série mensal de receitas.
+    """
 
-    return resultado[
-        [
-            "Mês",
-            "Resultado"
-        ]
-    ]
+    return ControladoriaSnapshot(
+        df_bi,
+        meses_selecionados
+    ).receita_mensal
 
 
-def calcular_margem_mensal(
+def calcular_despesa_mensal(
     df_bi,
     meses_selecionados
 ):
     """
-    Margem mensal em percentual.
+    Série mensal de despesas.
     """
 
-    receitas = calcular_receita_mensal(
+    return ControladoriaSnapshot(
         df_bi,
         meses_selecionados
-    )
+    ).despesa_mensal
 
-    resultado = calcular_resultado_mensal(
+
+def calcular_resultado_mensal(
+    df_bi,
+    meses_selecionados
+):
+    """
+    Série mensal de resultado.
+    """
+
+    return ControladoriaSnapshot(
         df_bi,
         meses_selecionados
-    )
-
-    if receitas.empty:
-        return pd.DataFrame()
+    ).resultado_mensal
 
-    margem = receitas.merge(
-        resultado,
-        on="Mês"
-    )
 
-    margem["Margem"] = margem.apply(
-        lambda row: (
-            row["Resultado"]
-            / row["Valor"]
-            * 100
-            if row["Valor"] != 0
-            else 0.0
-        ),
-        axis=1
-    )
+def calcular_margem_mensal(
+    df_bi,
+    meses_selecionados
+):
+    """
+    Margem mensal em percentual.
+    """
 
-    return margem[
-        [
-            "Mês",
-            "Margem"
-        ]
-    ]
+    return ControladoriaSnapshot(
+        df_bi,
+        meses_selecionados
+    ).margem_mensal
 
 
 def top_contas_analiticas(
@@ -297,38 +511,10 @@ def top_contas_analiticas(
     Maiores contas analíticas por valor absoluto.
     """
 
-    df = preparar_base_controladoria(
+    return ControladoriaSnapshot(
         df_bi,
         meses_selecionados
-    )
-
-    if df.empty:
-        return pd.DataFrame()
-
-    analiticas = df[
-        df["Nivel"] >= 4
-    ].copy()
-
-    analiticas[
-        "VALOR_ABSOLUTO"
-    ] = (
-        analiticas[
-            "ACUMULADO_CONTROLADORIA"
-        ].abs()
-    )
-
-    return (
-        analiticas[
-            analiticas[
-                "VALOR_ABSOLUTO"
-            ] > 0
-        ]
-        .sort_values(
-            "VALOR_ABSOLUTO",
-            ascending=False
-        )
-        .head(quantidade)
-    )
+    ).top_contas_analiticas(quantidade)
 
 
 def top_contas_receita(
@@ -340,27 +526,10 @@ def top_contas_receita(
     Maiores contas de receita.
     """
 
-    df = top_contas_analiticas(
+    return ControladoriaSnapshot(
         df_bi,
-        meses_selecionados,
-        quantidade=999
-    )
-
-    if df.empty:
-        return pd.DataFrame()
-
-    return (
-        df[
-            df["Conta"]
-            .astype(str)
-            .str.startswith("01")
-        ]
-        .sort_values(
-            "ACUMULADO_CONTROLADORIA",
-            ascending=False
-        )
-        .head(quantidade)
-    )
+        meses_selecionados
+    ).top_contas_receita(quantidade)
 
 
 def top_contas_despesa(
@@ -372,35 +541,10 @@ def top_contas_despesa(
     Maiores contas de despesa.
     """
 
-    df = top_contas_analiticas(
+    return ControladoriaSnapshot(
         df_bi,
-        meses_selecionados,
-        quantidade=999
-    )
-
-    if df.empty:
-        return pd.DataFrame()
-
-    df = df[
-        df["Conta"]
-        .astype(str)
-        .str.startswith("02")
-    ].copy()
-
-    df["ABS_DESPESA"] = (
-        df[
-            "ACUMULADO_CONTROLADORIA"
-        ].abs()
-    )
-
-    return (
-        df
-        .sort_values(
-            "ABS_DESPESA",
-            ascending=False
-        )
-        .head(quantidade)
-    )
+        meses_selecionados
+    ).top_contas_despesa(quantidade)
 
 
 def gerar_alertas_financeiros(
@@ -411,75 +555,10 @@ def gerar_alertas_financeiros(
     Gera alertas simples, objetivos e auditáveis.
     """
 
-    alertas = []
-
-    resumo = calcular_resumo_financeiro(
+    return ControladoriaSnapshot(
         df_bi,
         meses_selecionados
-    )
-
-    if resumo["resultado"] < 0:
-        alertas.append({
-            "nivel": "critico",
-            "titulo": "Resultado negativo",
-            "mensagem": (
-                "O período selecionado apresenta "
-                "prejuízo acumulado."
-            )
-        })
-
-    if resumo["receita"] > 0:
-        percentual_despesas = (
-            abs(
-                resumo["despesas"]
-            )
-            / resumo["receita"]
-            * 100
-        )
-
-        if percentual_despesas > 90:
-            alertas.append({
-                "nivel": "atencao",
-                "titulo": (
-                    "Despesas consumindo grande "
-                    "parte da receita"
-                ),
-                "mensagem": (
-                    f"As despesas representam "
-                    f"{percentual_despesas:.2f}% "
-                    "das receitas."
-                )
-            })
-
-    if resumo["margem"] < 5:
-        alertas.append({
-            "nivel": "atencao",
-            "titulo": "Margem reduzida",
-            "mensagem": (
-                f"A margem acumulada está em "
-                f"{resumo['margem']:.2f}%."
-            )
-        })
-
-    top_despesas = top_contas_despesa(
-        df_bi,
-        meses_selecionados,
-        quantidade=5
-    )
-
-    for _, row in top_despesas.iterrows():
-        alertas.append({
-            "nivel": "informacao",
-            "titulo": str(
-                row["Descrição"]
-            ),
-            "mensagem": (
-                "Conta relevante no período: "
-                f"{float(row['ACUMULADO_CONTROLADORIA']):.2f}"
-            )
-        })
-
-    return alertas
+    ).alertas
 
 
 def montar_contexto_diretoria(
@@ -491,65 +570,18 @@ def montar_contexto_diretoria(
     tanto pelo Painel Executivo quanto pelo Analista IA.
     """
 
-    resumo = calcular_resumo_financeiro(
+    return ControladoriaSnapshot(
         df_bi,
         meses_selecionados
-    )
-
-    top_receitas = top_contas_receita(
-        df_bi,
-        meses_selecionados,
-        quantidade=10
-    )
-
-    top_despesas = top_contas_despesa(
-        df_bi,
-        meses_selecionados,
-        quantidade=10
-    )
-
-    alertas = gerar_alertas_financeiros(
-        df_bi,
-        meses_selecionados
-    )
-
-    def converter_linhas(df):
-        if df is None or df.empty:
-            return []
-
-        registros = []
-
-        for _, row in df.iterrows():
-            registros.append({
-                "conta": str(
-                    row["Conta"]
-                ),
-                "descricao": str(
-                    row["Descrição"]
-                ),
-                "valor": float(
-                    row[
-                        "ACUMULADO_CONTROLADORIA"
-                    ]
-                )
-            })
+    ).contexto_diretoria()
 
-        return registros
 
-    return {
-        "resumo": resumo,
-        "top_receitas": converter_linhas(
-            top_receitas
-        ),
-        "top_despesas": converter_linhas(
-            top_despesas
-        ),
-        "alertas": alertas
-    }
 def calcular_resultado_por_centro_custo(
     df_movimentos,
     df_rateio_config=None,
-    usar_rateio=False
+    usar_rateio=False,
+    driver="despesa_direta",
+    pesos=None
 ):
     """
     Calcula receita, despesa, resultado e margem
@@ -557,7 +589,8 @@ def calcular_resultado_por_centro_custo(
 
     Se usar_rateio=True:
     distribui os centros classificados como 'rateio'
-    proporcionalmente às despesas diretas das obras.
+    entre as obras, na proporção do driver escolhido
+    (despesa_direta, receita ou peso).
 
     Centros classificados como 'fora' não entram
     no ranking de obras.
@@ -569,154 +602,85 @@ def calcular_resultado_por_centro_custo(
     ):
         return pd.DataFrame()
 
-    df = df_movimentos.copy()
-
-    df["Conta_ID"] = (
-        df["Conta_ID"]
-        .astype(str)
-        .str.strip()
-    )
-
-    df["Centro de Custo"] = (
-        df["Centro de Custo"]
-        .astype(str)
-        .str.strip()
+    resultado = calcular_resultado_centros(
+        df_movimentos,
+        df_rateio_config=df_rateio_config,
+        usar_rateio=usar_rateio,
+        driver=driver,
+        pesos=pesos
     )
 
-    df["Valor_Final"] = pd.to_numeric(
-        df["Valor_Final"],
-        errors="coerce"
-    ).fillna(0.0)
-
-    resultado = (
-        df
-        .groupby("Centro de Custo")
-        .apply(
-            lambda grupo: pd.Series({
-                "Receita": grupo[
-                    grupo["Conta_ID"]
-                    .astype(str)
-                    .str.startswith("01")
-                ]["Valor_Final"].sum(),
-
-                "Despesa Direta": grupo[
-                    grupo["Conta_ID"]
-                    .astype(str)
-                    .str.startswith("02")
-                ]["Valor_Final"].sum()
-            })
-        )
-        .reset_index()
-    )
+    # Ranking contém somente obras.
+    resultado = resultado[
+        resultado["Logica"] == "obra"
+    ].copy()
 
-    resultado["Logica"] = "obra"
+    return resultado.sort_values(
+        by="Resultado",
+        ascending=False
+    ).reset_index(drop=True)
 
-    if (
-        df_rateio_config is not None
-        and not df_rateio_config.empty
-    ):
-        config = df_rateio_config.copy()
 
-        config["Centro de Custo"] = (
-            config["Centro de Custo"]
-            .astype(str)
-            .str.strip()
-        )
+def comparar_cenarios_rateio(
+    df_movimentos,
+    cenarios,
+    df_rateio_config=None
+):
+    """
+    Compara o resultado das obras em vários cenários de rateio
+    (drivers e reclassificações de centros), sem gravar nada.
 
-        config["Logica"] = (
-            config["Logica"]
-            .astype(str)
-            .str.lower()
-            .str.strip()
-        )
+    Devolve uma linha por obra com o Resultado de cada cenário e a
+    diferença de cada um para o primeiro cenário da lista.
+    Centros que não são obra em um cenário ficam vazios nele.
+    """
 
-        mapa_logica = dict(
-            zip(
-                config["Centro de Custo"],
-                config["Logica"]
-            )
-        )
+    simulacao = simular_cenarios_rateio(
+        df_movimentos,
+        cenarios,
+        df_rateio_config=df_rateio_config
+    )
 
-        resultado["Logica"] = (
-            resultado["Centro de Custo"]
-            .map(mapa_logica)
-            .fillna("obra")
-        )
+    if simulacao.empty:
+        return pd.DataFrame()
 
-    resultado["Rateio Estrutura"] = 0.0
+    nomes = list(
+        dict.fromkeys(simulacao["Cenário"])
+    )
 
-    if usar_rateio:
-        bolo_rateio = resultado.loc[
-            resultado["Logica"] == "rateio",
-            "Despesa Direta"
-        ].sum()
+    obras = simulacao[
+        simulacao["Logica"] == "obra"
+    ]
 
-        idx_obras = (
-            (resultado["Logica"] == "obra")
-            &
-            (resultado["Despesa Direta"] != 0)
+    comparacao = (
+        obras
+        .pivot(
+            index="Centro de Custo",
+            columns="Cenário",
+            values="Resultado"
         )
+        .reindex(columns=nomes)
+    )
 
-        total_base_rateio = resultado.loc[
-            idx_obras,
-            "Despesa Direta"
-        ].sum()
-
-        if abs(total_base_rateio) > 0:
-            resultado.loc[
-                idx_obras,
-                "Rateio Estrutura"
-            ] = (
-                resultado.loc[
-                    idx_obras,
-                    "Despesa Direta"
-                ]
-                /
-                total_base_rateio
-                *
-                bolo_rateio
-            )
-
-    # Ranking contém somente obras.
-    resultado = resultado[
-        resultado["Logica"] == "obra"
-    ].copy()
+    referencia = nomes[0]
 
-    resultado["Resultado"] = (
-        resultado["Receita"]
-        + resultado["Despesa Direta"]
-        + resultado["Rateio Estrutura"]
-    )
+    for nome in nomes[1:]:
+        comparacao[f"Δ {nome}"] = (
+            comparacao[nome]
+            - comparacao[referencia]
+        )
 
-    resultado["Margem %"] = resultado.apply(
-        lambda row: (
-            row["Resultado"]
-            / row["Receita"]
-            * 100
-            if row["Receita"] != 0
-            else 0.0
-        ),
-        axis=1
-    )
+    comparacao.columns.name = None
 
-    resultado["Status"] = resultado.apply(
-        lambda row: (
-            "Crítico"
-            if row["Resultado"] < 0
-            else (
-                "Atenção"
-                if row["Margem %"] < 10
-                else "Saudável"
-            )
-        ),
-        axis=1
+    return (
+        comparacao
+        .sort_values(
+            by=referencia,
+            ascending=False
+        )
+        .reset_index()
     )
 
-    return resultado.sort_values(
-        by="Resultado",
-        ascending=False
-    ).reset_index(drop=True)
-
 
 def ranking_melhores_obras(
     df_resultado_obras,
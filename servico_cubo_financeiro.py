@@ -0,0 +1,402 @@
+import uuid
+
+import pandas as pd
+
+from servico_agregacao import CHAVE_AGREGADOS, agregar_movimentos, normalizar_agregados
+from servico_busca_supabase import buscar_todos_keyset, executar_com_retentativa
+from servico_indice_movimentos import TABELA_INDICE
+
+
+# Cubo financeiro materializado: uma linha por
+# (ano, mês, conta, centro de custo) com o valor somado e a
+# quantidade de lançamentos. É regravado mês a mês na importação,
+# então os relatórios leem somas prontas em vez dos lançamentos.
+#
+# create table movimentos_cubo (
+#     ano integer not null,
+#     mes integer not null,
+#     conta_id text not null,
+#     centro_custo text not null,
+#     valor numeric not null default 0,
+#     quantidade integer not null default 0,
+#     primary key (ano, mes, conta_id, centro_custo)
+# );
+
+TABELA_CUBO = "movimentos_cubo"
+
+# Cada mês do cubo é trocado de uma vez, como em movimentos_financeiros:
+# as linhas vão para o staging e trocar_mes_cubo substitui o mês e
+# grava a marca de versão numa única transação. A marca guarda o
+# digest da carga (movimentos_indice) de onde o mês foi montado; mês
+# sem marca, ou com digest diferente do índice, é remontado na leitura.
+TABELA_CUBO_STAGING = "movimentos_cubo_staging"
+TABELA_CUBO_VERSOES = "movimentos_cubo_versoes"
+FUNCAO_TROCAR_MES_CUBO = "trocar_mes_cubo"
+
+SQL_TABELAS_CUBO = """
+create table movimentos_cubo_staging (
+    carga_id text not null,
+    linha integer not null,
+    ano integer not null,
+    mes integer not null,
+    conta_id text not null,
+    centro_custo text not null,
+    valor numeric not null default 0,
+    quantidade integer not null default 0,
+    primary key (carga_id, linha)
+);
+
+create table movimentos_cubo_versoes (
+    ano integer not null,
+    mes integer not null,
+    digest text,
+    quantidade integer not null default 0,
+    atualizado_em timestamptz not null default now(),
+    primary key (ano, mes)
+);
+"""
+
+SQL_FUNCAO_TROCAR_MES_CUBO = """
+create or replace function trocar_mes_cubo(
+    p_ano integer,
+    p_mes integer,
+    p_carga text,
+    p_quantidade integer,
+    p_digest text
+) returns integer
+language plpgsql
+as $$
+declare
+    v_total integer;
+begin
+    delete from movimentos_cubo
+    where ano = p_ano and mes = p_mes;
+
+    insert into movimentos_cubo (ano, mes, conta_id, centro_custo, valor, quantidade)
+    select ano, mes, conta_id, centro_custo, valor, quantidade
+    from movimentos_cubo_staging
+    where carga_id = p_carga;
+
+    get diagnostics v_total = row_count;
+
+    if v_total <> p_quantidade then
+        raise exception 'Cubo % incompleto: % de % linhas no staging',
+            p_carga, v_total, p_quantidade;
+    end if;
+
+    insert into movimentos_cubo_versoes (ano, mes, digest, quantidade, atualizado_em)
+    values (p_ano, p_mes, p_digest, v_total, now())
+    on conflict (ano, mes) do update
+    set digest = excluded.digest,
+        quantidade = excluded.quantidade,
+        atualizado_em = excluded.atualizado_em;
+
+    delete from movimentos_cubo_staging
+    where carga_id = p_carga;
+
+    return v_total;
+end;
+$$
+"""
+
+
+def montar_cubo(df_mov):
+    """
+    Monta o cubo a partir de movimentos já normalizados
+    (Ano, Mes, Conta_ID, Centro de Custo, Valor_Final).
+    """
+
+    return agregar_movimentos(df_mov)
+
+
+def registros_cubo(df_cubo):
+    """
+    Converte o cubo para os registros da tabela movimentos_cubo.
+    """
+
+    if df_cubo is None or df_cubo.empty:
+        return []
+
+    return [
+        {
+            "ano": int(ano),
+            "mes": int(mes),
+            "conta_id": str(conta).strip(),
+            "centro_custo": "" if pd.isna(centro) else str(centro).strip(),
+            "valor": float(valor),
+            "quantidade": int(quantidade),
+        }
+        for ano, mes, conta, centro, valor, quantidade in zip(
+            df_cubo["Ano"],
+            df_cubo["Mes"],
+            df_cubo["Conta_ID"],
+            df_cubo["Centro de Custo"],
+            df_cubo["Valor_Final"],
+            df_cubo["Quantidade"],
+        )
+        if not pd.isna(ano) and not pd.isna(mes) and not pd.isna(conta)
+    ]
+
+
+def registrar_periodo_cubo(supabase_client, ano, mes_num, df_cubo_mes, digest=None):
+    """
+    Substitui no cubo as linhas de um mês, de forma atômica.
+
+    As linhas são gravadas no staging e trocar_mes_cubo troca o mês e
+    grava a marca de versão com `digest` (o da carga que originou o
+    mês). Se algo falhar antes da troca, o mês anterior e sua marca
+    continuam valendo e o staging da carga é descartado.
+    """
+
+    carga_id = uuid.uuid4().hex
+    registros = [
+        {**registro, "carga_id": carga_id, "linha": linha}
+        for linha, registro in enumerate(registros_cubo(df_cubo_mes))
+    ]
+    tamanho_lote = 500
+
+    try:
+        for i in range(0, len(registros), tamanho_lote):
+            lote = registros[i:i + tamanho_lote]
+            executar_com_retentativa(
+                lambda lote=lote: (
+                    supabase_client
+                    .table(TABELA_CUBO_STAGING)
+                    .upsert(lote, on_conflict="carga_id,linha")
+                    .execute()
+                )
+            )
+
+        (
+            supabase_client
+            .rpc(
+                FUNCAO_TROCAR_MES_CUBO,
+                {
+                    "p_ano": int(ano),
+                    "p_mes": int(mes_num),
+                    "p_carga": carga_id,
+                    "p_quantidade": len(registros),
+                    "p_digest": digest,
+                }
+            )
+            .execute()
+        )
+    except Exception:
+        try:
+            (
+                supabase_client
+                .table(TABELA_CUBO_STAGING)
+                .delete()
+                .eq("carga_id", carga_id)
+                .execute()
+            )
+        except Exception:
+            pass
+        raise
+
+
+def _ler_digests(supabase_client, tabela, ano, meses):
+    resposta = (
+        supabase_client
+        .table(tabela)
+        .select("mes,digest")
+        .eq("ano", int(ano))
+        .in_("mes", meses)
+        .execute()
+    )
+
+    return {
+        int(registro["mes"]): registro.get("digest")
+        for registro in (resposta.data or [])
+    }
+
+
+def meses_atualizados_cubo(supabase_client, ano, meses_numeros, cargas=None):
+    """
+    Meses cujo cubo está completo e foi montado a partir da carga
+    atual: têm marca de versão e o digest dela é o mesmo do índice.
+    `cargas` ({mes: digest} do índice) evita relê-lo.
+    """
+
+    meses = [int(m) for m in meses_numeros]
+
+    if not meses:
+        return set()
+
+    versoes = _ler_digests(supabase_client, TABELA_CUBO_VERSOES, ano, meses)
+
+    if cargas is None:
+        cargas = _ler_digests(supabase_client, TABELA_INDICE, ano, meses)
+
+    return {
+        mes for mes, digest in versoes.items()
+        if digest == cargas.get(mes)
+    }
+
+
+def carregar_cubo(supabase_client, ano, meses_numeros):
+    """
+    Lê do Supabase as linhas do cubo dos meses informados.
+    """
+
+    meses = [int(m) for m in meses_numeros]
+
+    if not meses:
+        return montar_cubo(None)
+
+    return normalizar_agregados(
+        buscar_todos_keyset(
+            lambda: (
+                supabase_client
+                .table(TABELA_CUBO)
+                .select("ano,mes,conta_id,centro_custo,valor,quantidade")
+                .eq("ano", int(ano))
+                .in_("mes", meses)
+            ),
+            coluna_chave=CHAVE_AGREGADOS
+        )
+    )
+
+
+def carregar_cubo_periodo(
+    supabase_client,
+    ano,
+    meses_numeros,
+    carregar_movimentos
+):
+    """
+    Cubo dos meses informados, completo.
+
+    Só valem os meses com marca de versão igual ao digest da carga
+    no índice (meses_atualizados_cubo). Os demais (nunca montados,
+    gravados pela metade ou de uma carga anterior) são montados a
+    partir dos lançamentos (carregar_movimentos(ano, meses) →
+    movimentos normalizados) e regravados para as próximas leituras.
+    Se o cubo não puder ser lido, tudo é montado localmente.
+    """
+
+    meses = [int(m) for m in meses_numeros]
+
+    if not meses:
+        return montar_cubo(None)
+
+    try:
+        cargas = _ler_digests(supabase_client, TABELA_INDICE, ano, meses)
+        atualizados = meses_atualizados_cubo(supabase_client, ano, meses, cargas)
+        df_cubo = fatiar_cubo(
+            carregar_cubo(supabase_client, ano, sorted(atualizados)),
+            meses=atualizados
+        )
+        cubo_disponivel = True
+    except Exception:
+        atualizados = set()
+        cargas = {}
+        df_cubo = montar_cubo(None)
+        cubo_disponivel = False
+
+    faltantes = [m for m in meses if m not in atualizados]
+
+    if not faltantes:
+        return df_cubo
+
+    df_faltantes = montar_cubo(carregar_movimentos(int(ano), faltantes))
+
+    if cubo_disponivel:
+        for mes in faltantes:
+            try:
+                registrar_periodo_cubo(
+                    supabase_client,
+                    ano,
+                    mes,
+                    fatiar_cubo(df_faltantes, meses=[mes]),
+                    digest=cargas.get(mes)
+                )
+            except Exception:
+                # O cubo é só um atalho: sem gravar, o mês
+                # continua sendo montado na próxima leitura.
+                continue
+
+    partes = [df for df in (df_cubo, df_faltantes) if not df.empty]
+
+    if not partes:
+        return montar_cubo(None)
+
+    return pd.concat(partes, ignore_index=True)
+
+
+def fatiar_cubo(
+    df_cubo,
+    anos=None,
+    meses=None,
+    centros_custo=None,
+    prefixo_conta=None
+):
+    """
+    Recorta o cubo por anos, meses, centros de custo e prefixo
+    de conta. Filtros None não restringem nada.
+    """
+
+    if df_cubo is None or df_cubo.empty:
+        return df_cubo
+
+    mascara = pd.Series(True, index=df_cubo.index)
+
+    if anos is not None:
+        mascara &= df_cubo["Ano"].isin([int(a) for a in anos])
+
+    if meses is not None:
+        mascara &= df_cubo["Mes"].isin([int(m) for m in meses])
+
+    if centros_custo is not None:
+        mascara &= df_cubo["Centro de Custo"].isin(list(centros_custo))
+
+    if prefixo_conta:
+        mascara &= (
+            df_cubo["Conta_ID"]
+            .astype(str)
+            .str.startswith(str(prefixo_conta))
+        )
+
+    return df_cubo[mascara]
+
+
+def somar_cubo(df_cubo, por, prefixos=None):
+    """
+    Soma Valor_Final do cubo agrupando pelas colunas `por`.
+
+    Sem prefixos devolve uma Series. Com prefixos
+    ({"Receitas": "01", ...}) devolve um DataFrame com uma coluna
+    por prefixo de conta, mantendo todos os grupos do cubo.
+    """
+
+    if prefixos is None:
+        return (
+            df_cubo
+            .groupby(por, observed=True)["Valor_Final"]
+            .sum()
+        )
+
+    contas = df_cubo["Conta_ID"].astype(str)
+
+    valores = pd.DataFrame(
+        {
+            nome: df_cubo["Valor_Final"].where(
+                contas.str.startswith(prefixo),
+                0.0
+            )
+            for nome, prefixo in prefixos.items()
+        },
+        index=df_cubo.index
+    )
+
+    chaves = [por] if isinstance(por, str) else list(por)
+
+    for chave in chaves:
+        valores[chave] = df_cubo[chave]
+
+    return (
+        valores
+        .groupby(chaves, observed=True)
+        .sum()
+        .reset_index()
+    )
@@ -0,0 +1,129 @@
+import pandas as pd
+
+
+# Colunas lidas de cada tabela e o tipo de destino no pandas.
+# A mesma declaração define o select (só o necessário trafega)
+# e a conversão de tipos feita uma única vez após a leitura.
+ESQUEMAS = {
+    "movimentos_financeiros": {
+        "id": "Int64",
+        "data": "string",
+        "ano": "Int16",
+        "mes": "Int8",
+        "conta_id": "category",
+        "centro_custo": "category",
+        "valor": "float64",
+    },
+    "plano_contas": {
+        "id": "Int64",
+        "conta_id": "string",
+        "descricao": "string",
+        "nivel": "Int8",
+        "classificacao": "string",
+    },
+    "rateio_config": {
+        "id": "Int64",
+        "centro_custo": "string",
+        "logica": "string",
+        "peso": "float64",
+    },
+    "orcamento_itens": {
+        "id": "Int64",
+        "orcamento_id": "Int64",
+        "conta_id": "string",
+        "mes": "Int8",
+        "valor_orcado": "float64",
+    },
+}
+
+
+# Colunas numéricas em que a ausência de valor significa zero.
+# Nas demais (peso, valor_orcado) o nulo é mantido como NaN:
+# "sem peso" ou "sem orçamento" não é o mesmo que 0.
+COLUNAS_ZERO_QUANDO_NULO = {
+    "movimentos_financeiros": {"valor"},
+}
+
+
+# Colunas criadas por migração manual, que podem ainda não existir
+# no banco (ver o alter table em servico_rateio).
+COLUNAS_OPCIONAIS = {
+    "rateio_config": {"peso"},
+}
+
+
+def colunas_select(tabela, opcionais=True):
+    """
+    Lista de colunas para o .select() do Supabase. Com
+    opcionais=False, deixa de fora as de COLUNAS_OPCIONAIS.
+    """
+
+    ignoradas = set() if opcionais else COLUNAS_OPCIONAIS.get(tabela, set())
+
+    return ",".join(
+        coluna
+        for coluna in ESQUEMAS[tabela]
+        if coluna not in ignoradas
+    )
+
+
+def erro_coluna_ausente(erro):
+    """
+    Indica se o erro do Supabase é de coluna inexistente: 42703
+    do Postgres na leitura, PGRST204 do PostgREST na escrita.
+    """
+
+    texto = str(erro)
+
+    return "42703" in texto or "PGRST204" in texto
+
+
+def aplicar_esquema(df, tabela, categorias=True):
+    """
+    Converte as colunas de uma leitura bruta para os tipos
+    declarados da tabela.
+
+    Textos são aparados. Com categorias=False, colunas "category"
+    ficam como texto (útil antes de juntar partições diferentes,
+    cujas categorias não coincidem).
+    Colunas fora do esquema são mantidas como vieram. Numéricos
+    nulos viram 0 só nas colunas de COLUNAS_ZERO_QUANDO_NULO.
+    """
+
+    df = pd.DataFrame(df).copy()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+
+    for coluna, tipo in ESQUEMAS[tabela].items():
+        if coluna not in df.columns:
+            continue
+
+        if tipo in ("string", "category"):
+            texto = (
+                df[coluna]
+                .astype("string")
+                .str.strip()
+            )
+
+            df[coluna] = (
+                texto.astype("category")
+                if tipo == "category" and categorias
+                else texto
+            )
+        elif tipo == "float64":
+            numeros = pd.to_numeric(
+                df[coluna],
+                errors="coerce"
+            ).astype("float64")
+
+            df[coluna] = (
+                numeros.fillna(0.0)
+                if coluna in COLUNAS_ZERO_QUANDO_NULO.get(tabela, ())
+                else numeros
+            )
+        else:
+            df[coluna] = pd.to_numeric(
+                df[coluna],
+                errors="coerce"
+            ).astype(tipo)
+
+    return df
@@ -0,0 +1,689 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+LIMITE_ARVORES_EM_CACHE = 8
+
+_cache_arvores = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def calcular_versao_plano(df_plano):
+    """
+    Gera a versão do plano de contas a partir de Conta e Nivel.
+
+    Qualquer alteração de código, nível ou ordem das contas
+    gera uma nova versão e, portanto, uma nova árvore.
+    """
+
+    if df_plano is None or df_plano.empty:
+        return "vazio"
+
+    chave = pd.DataFrame({
+        "Conta": df_plano["Conta"].astype(str).str.strip(),
+        "Nivel": pd.to_numeric(
+            df_plano["Nivel"],
+            errors="coerce"
+        ).fillna(0).astype(int)
+    })
+
+    hashes = pd.util.hash_pandas_object(
+        chave,
+        index=False
+    ).to_numpy()
+
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+
+def normalizar_codigos_conta(contas, niveis):
+    """
+    Limpa os códigos de conta vindos da planilha, todos de uma
+    vez, com métodos de texto em vez de uma função por linha.
+
+    - Código digitado como data (com "/" ou "-") e 3 ou mais partes:
+      "MM/DD/AAAA" vira "DD.MM.AAA" (2001 vira 001)
+    - Nível 3 com ".": mantém só as duas primeiras partes e
+      completa "01.1" para "01.10" (preserva o .10)
+    - Níveis 2 e 3 com primeiro segmento de 1 dígito ganham zero
+    - Código ausente (None, NaN) vira ""
+    """
+
+    # fillna antes do astype: conforme a versão do pandas, o astype(str)
+    # mantém o nulo como NaN em vez de virar texto.
+    v = pd.Series(contas, dtype=object).fillna("").astype(str).str.strip()
+    niveis = pd.Series(
+        pd.to_numeric(pd.Series(niveis).to_numpy(), errors="coerce"),
+        index=v.index
+    )
+
+    tem_separador_data = v.str.contains(r"[/\-]", regex=True)
+    v = v.where(
+        ~tem_separador_data,
+        v.str.replace(r"[/\-]", ".", regex=True)
+    )
+
+    partes = v.str.split(".")
+    eh_data = tem_separador_data & (partes.str.len() >= 3)
+
+    terceira = partes.str[2].fillna("")
+    ano = terceira.str[-3:].where(
+        ~terceira.str.contains("2001", regex=False),
+        "001"
+    )
+    codigo_data = (
+        partes.str[1].fillna("").str.zfill(2)
+        + "."
+        + partes.str[0].fillna("").str.zfill(2)
+        + "."
+        + ano
+    )
+
+    nivel_3 = (niveis == 3) & v.str.contains(".", regex=False) & ~eh_data
+    segunda = partes.str[1].fillna("")
+    v = v.where(
+        ~nivel_3,
+        partes.str[0].fillna("").str.zfill(2)
+        + "."
+        + segunda
+        + np.where(segunda.str.len() == 1, "0", "")
+    )
+
+    primeiro_segmento = v.str.split(".").str[0]
+    sem_zero = (
+        niveis.isin([2, 3])
+        & ~eh_data
+        & ~v.str.startswith("0")
+        & (
+            (v.str.len() == 1)
+            | (
+                v.str.contains(".", regex=False)
+                & (primeiro_segmento.str.len() == 1)
+            )
+        )
+    )
+    v = v.where(~sem_zero, "0" + v)
+
+    return v.where(~eh_data, codigo_data)
+
+
+def chave_ordem_contas(contas):
+    """
+    Chave numérica de ordenação: uma coluna por segmento do código.
+
+    Segmentos não numéricos valem 0 e segmentos ausentes valem -1,
+    para que "01" venha antes de "01.00".
+    """
+
+    partes = (
+        pd.Series(contas)
+        .astype(str)
+        .str.split(".", expand=True)
+    )
+
+    numeros = partes.apply(
+        lambda coluna: pd.to_numeric(
+            coluna.where(coluna.str.fullmatch(r"\d+", na=False)),
+            errors="coerce"
+        )
+    )
+
+    numeros = numeros.fillna(0).where(partes.notna(), -1)
+    numeros.columns = [f"_ordem_{i}" for i in range(numeros.shape[1])]
+
+    return numeros.astype("int64")
+
+
+LIMITE_PLANOS_EM_CACHE = 8
+
+_cache_planos = OrderedDict()
+
+
+def normalizar_plano_contas(df_plano):
+    """
+    Normaliza o plano de contas (Conta, Descrição, Nivel, Classificacao):
+    descarta linhas sem conta ou nível, padroniza os códigos,
+    ordena pela chave numérica e completa a classificação.
+
+    O resultado fica guardado pelo hash do conteúdo: enquanto o plano
+    lido do banco não mudar, a limpeza não é refeita.
+    """
+
+    if df_plano is None or df_plano.empty:
+        return pd.DataFrame()
+
+    versao = hashlib.sha1(
+        pd.util.hash_pandas_object(
+            df_plano.astype(str),
+            index=False
+        ).to_numpy().tobytes()
+        + "|".join(map(str, df_plano.columns)).encode("utf-8")
+    ).hexdigest()
+
+    with _cache_lock:
+        normalizado = _cache_planos.get(versao)
+
+        if normalizado is not None:
+            _cache_planos.move_to_end(versao)
+            return normalizado.copy()
+
+    df = df_plano.copy()
+    df["Nivel"] = pd.to_numeric(df["Nivel"], errors="coerce")
+    df = df.dropna(subset=["Conta", "Nivel"]).copy()
+    df["Nivel"] = df["Nivel"].astype(int)
+    df["Conta"] = normalizar_codigos_conta(df["Conta"], df["Nivel"]).str.strip()
+
+    ordem = chave_ordem_contas(df["Conta"])
+    ordem.index = df.index
+
+    df = (
+        df
+        .join(ordem)
+        .sort_values(by=list(ordem.columns), kind="stable")
+        .drop(columns=list(ordem.columns))
+        .reset_index(drop=True)
+    )
+
+    if "Classificacao" in df.columns:
+        df["Classificacao"] = (
+            df["Classificacao"]
+            .fillna("operacional")
+            .astype(str)
+            .str.lower()
+            .str.strip()
+        )
+
+    with _cache_lock:
+        _cache_planos[versao] = df
+
+        while len(_cache_planos) > LIMITE_PLANOS_EM_CACHE:
+            _cache_planos.popitem(last=False)
+
+    return df.copy()
+
+
+class ArvoreContas:
+    """
+    Estrutura compilada do plano de contas.
+
+    Guarda, por posição de linha do plano:
+    - pais: posição da conta-mãe (-1 quando não existe)
+    - niveis: nível de cada conta
+    - eh_folha: True quando nenhuma outra conta começa com "conta."
+    - ordem_consolidacao: níveis do mais profundo ao mais raso,
+      com as posições das filhas e das mães de cada nível
+
+    Com isso a consolidação de qualquer conjunto de colunas
+    custa O(contas × colunas).
+    """
+
+    def __init__(self, df_plano):
+        self.versao = calcular_versao_plano(df_plano)
+
+        self.contas = np.array(
+            df_plano["Conta"]
+            .astype(str)
+            .str.strip()
+            .tolist(),
+            dtype=object
+        )
+
+        self.niveis = (
+            pd.to_numeric(
+                df_plano["Nivel"],
+                errors="coerce"
+            )
+            .fillna(0)
+            .astype(int)
+            .to_numpy()
+        )
+
+        self.pais = self._mapear_pais()
+        self.eh_folha = self._marcar_folhas()
+        self.ordem_consolidacao = self._montar_ordem_consolidacao()
+
+    def __len__(self):
+        return len(self.contas)
+
+    def _mapear_pais(self):
+        """
+        A mãe é a conta do nível imediatamente superior cujo
+        código, seguido de ".", é prefixo da conta.
+        """
+
+        posicoes = {}
+
+        for posicao, chave in enumerate(zip(self.contas, self.niveis)):
+            posicoes.setdefault(chave, posicao)
+
+        pais = np.full(
+            len(self.contas),
+            -1,
+            dtype=np.int64
+        )
+
+        for posicao, (conta, nivel) in enumerate(zip(self.contas, self.niveis)):
+            partes = conta.split(".")
+
+            # Sobe segmento por segmento até achar a mãe
+            # no nível imediatamente superior.
+            while len(partes) > 1:
+                partes = partes[:-1]
+                pai = posicoes.get(
+                    (".".join(partes), nivel - 1)
+                )
+
+                if pai is not None:
+                    pais[posicao] = pai
+                    break
+
+        return pais
+
+    def _marcar_folhas(self):
+        prefixos = set()
+
+        for conta in self.contas:
+            partes = conta.split(".")
+
+            for tamanho in range(1, len(partes)):
+                prefixos.add(".".join(partes[:tamanho]))
+
+        return np.array(
+            [conta not in prefixos for conta in self.contas],
+            dtype=bool
+        )
+
+    def _montar_ordem_consolidacao(self):
+        ordem = []
+
+        for nivel in sorted(set(self.niveis.tolist()), reverse=True):
+            # O nível 1 é o RESULTADO e é tratado à parte.
+            if nivel <= 2:
+                continue
+
+            filhos = np.flatnonzero(
+                (self.niveis == nivel) & (self.pais >= 0)
+            )
+
+            if not filhos.size:
+                continue
+
+            pais_filhos = self.pais[filhos]
+
+            ordem.append(
+                (nivel, filhos, pais_filhos, np.unique(pais_filhos))
+            )
+
+        return ordem
+
+    def consolidar(
+        self,
+        valores,
+        somar_lancamento_direto=True,
+        nivel_maximo=None,
+        substituir_sempre=False
+    ):
+        """
+        Consolida uma matriz (contas × colunas) de baixo para cima.
+
+        Regras:
+        - Cada conta recebe o total das contas-filhas do nível abaixo
+        - somar_lancamento_direto=True: lançamento feito direto na
+          conta-mãe é preservado e somado ao total das filhas
+        - somar_lancamento_direto=False: o total das filhas substitui
+          o valor da conta-mãe quando for diferente de zero
+        - substituir_sempre=True (com somar_lancamento_direto=False):
+          toda conta-mãe com filhas recebe o total delas, mesmo zero
+        - nivel_maximo limita quais níveis de filhas sobem na árvore
+        - Nível 1 representa o RESULTADO: soma das contas de nível 2
+        """
+
+        valores = np.array(valores, dtype=float)
+        unidimensional = valores.ndim == 1
+
+        if unidimensional:
+            valores = valores.reshape(-1, 1)
+
+        for nivel, filhos, pais_filhos, pais_unicos in self.ordem_consolidacao:
+            if nivel_maximo is not None and nivel > nivel_maximo:
+                continue
+
+            if somar_lancamento_direto:
+                np.add.at(
+                    valores,
+                    pais_filhos,
+                    valores[filhos]
+                )
+                continue
+
+            total_filhos = np.zeros(
+                (len(pais_unicos), valores.shape[1])
+            )
+
+            np.add.at(
+                total_filhos,
+                np.searchsorted(pais_unicos, pais_filhos),
+                valores[filhos]
+            )
+
+            if substituir_sempre:
+                valores[pais_unicos] = total_filhos
+                continue
+
+            atual = valores[pais_unicos]
+
+            valores[pais_unicos] = np.where(
+                total_filhos != 0,
+                total_filhos,
+                atual
+            )
+
+        mask_nivel_1 = self.niveis == 1
+
+        if mask_nivel_1.any():
+            valores[mask_nivel_1] = valores[self.niveis == 2].sum(axis=0)
+
+        return valores.ravel() if unidimensional else valores
+
+
+def obter_arvore_contas(df_plano):
+    """
+    Devolve a árvore do plano de contas, reaproveitando a já
+    compilada enquanto a versão do plano não mudar.
+    """
+
+    versao = calcular_versao_plano(df_plano)
+
+    with _cache_lock:
+        arvore = _cache_arvores.get(versao)
+
+        if arvore is not None:
+            _cache_arvores.move_to_end(versao)
+            return arvore
+
+    arvore = ArvoreContas(df_plano)
+
+    with _cache_lock:
+        _cache_arvores[versao] = arvore
+
+        while len(_cache_arvores) > LIMITE_ARVORES_EM_CACHE:
+            _cache_arvores.popitem(last=False)
+
+    return arvore
+
+
+CLASSIFICACAO_PADRAO = "operacional"
+
+LIMITE_CLASSIFICACOES_EM_CACHE = 8
+
+_cache_classificacoes = OrderedDict()
+
+
+def _herdar_classificacao(conta, mapa, padrao):
+    partes = str(conta).strip().split(".")
+
+    while partes:
+        codigo = ".".join(partes)
+
+        if codigo in mapa:
+            return mapa[codigo]
+
+        partes = partes[:-1]
+
+    return padrao
+
+
+def mapa_classificacao_herdada(df_plano, padrao=CLASSIFICACAO_PADRAO):
+    """
+    Classificação efetiva de cada código do plano e de todos os
+    prefixos alcançáveis a partir dele ("02.01.001" → "02.01" → "02"):
+    a própria, se a conta existir, ou a do ancestral mais próximo.
+
+    Calculado uma vez por versão de Conta e Classificacao do plano.
+    """
+
+    if df_plano is None or df_plano.empty:
+        return {}
+
+    contas = df_plano["Conta"].astype(str).str.strip()
+    classificacoes = (
+        df_plano["Classificacao"]
+        .fillna(padrao)
+        .astype(str)
+        .str.lower()
+        .str.strip()
+    )
+
+    versao = (
+        hashlib.sha1(
+            pd.util.hash_pandas_object(
+                pd.DataFrame({
+                    "Conta": contas,
+                    "Classificacao": classificacoes,
+                }),
+                index=False
+            ).to_numpy().tobytes()
+        ).hexdigest(),
+        padrao,
+    )
+
+    with _cache_lock:
+        mapa = _cache_classificacoes.get(versao)
+
+        if mapa is not None:
+            _cache_classificacoes.move_to_end(versao)
+            return mapa
+
+    proprias = dict(zip(contas, classificacoes))
+
+    codigos = set(proprias)
+    for conta in proprias:
+        partes = conta.split(".")
+        codigos.update(
+            ".".join(partes[:i])
+            for i in range(1, len(partes))
+        )
+
+    mapa = {
+        codigo: _herdar_classificacao(codigo, proprias, padrao)
+        for codigo in codigos
+    }
+
+    with _cache_lock:
+        _cache_classificacoes[versao] = mapa
+
+        while len(_cache_classificacoes) > LIMITE_CLASSIFICACOES_EM_CACHE:
+            _cache_classificacoes.popitem(last=False)
+
+    return mapa
+
+
+def classificar_contas(contas, df_plano, padrao=CLASSIFICACAO_PADRAO):
+    """
+    Classificação herdada de cada conta de `contas` (Series).
+
+    Cada código distinto é resolvido uma única vez; códigos fora do
+    plano sobem pelos prefixos até o primeiro que o mapa conhece.
+    """
+
+    contas = pd.Series(contas).astype(str).str.strip()
+    mapa = mapa_classificacao_herdada(df_plano, padrao)
+
+    unicas = pd.unique(contas.to_numpy())
+    resolvidas = {
+        conta: _herdar_classificacao(conta, mapa, padrao)
+        for conta in unicas
+    }
+
+    return contas.map(resolvidas)
+
+
+def lancar_movimentos_no_plano(
+    df_base,
+    df_movimentos,
+    colunas_por_mes
+):
+    """
+    Soma os movimentos por conta e mês e grava cada mês na
+    coluna correspondente do plano, exatamente na conta lançada.
+
+    colunas_por_mes: {numero_do_mes: nome_da_coluna}
+    """
+
+    df = df_base.copy()
+    colunas = list(colunas_por_mes.values())
+
+    for coluna in colunas:
+        df[coluna] = 0.0
+
+    if df_movimentos is None or df_movimentos.empty or not colunas:
+        return df
+
+    movimentos = df_movimentos[
+        df_movimentos["Mes"].isin(list(colunas_por_mes))
+    ]
+
+    if movimentos.empty:
+        return df
+
+    valores_mes = (
+        movimentos
+        .groupby(["Conta_ID", "Mes"], observed=True)["Valor_Final"]
+        .sum()
+        .unstack(fill_value=0.0)
+        .rename(columns=lambda mes_num: colunas_por_mes.get(int(mes_num)))
+    )
+
+    valores_mes.index = valores_mes.index.astype(str)
+
+    valores_mes = valores_mes.reindex(
+        index=df["Conta"].astype(str).str.strip(),
+        columns=colunas
+    ).fillna(0.0)
+
+    df[colunas] = valores_mes.to_numpy()
+
+    return df
+
+
+def consolidar_valores_plano(
+    df_base,
+    colunas_valores,
+    somar_lancamento_direto=True,
+    nivel_maximo=None,
+    substituir_sempre=False
+):
+    """
+    Consolida as colunas de valores de um DataFrame no formato
+    do plano de contas (Conta, Nivel) usando a árvore em cache.
+    As regras são as de ArvoreContas.consolidar.
+    """
+
+    df = df_base.copy()
+
+    if df.empty or not colunas_valores:
+        return df
+
+    arvore = obter_arvore_contas(df)
+
+    valores = (
+        df[colunas_valores]
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0.0)
+    )
+
+    df[colunas_valores] = arvore.consolidar(
+        valores,
+        somar_lancamento_direto=somar_lancamento_direto,
+        nivel_maximo=nivel_maximo,
+        substituir_sempre=substituir_sempre
+    )
+
+    return df
+
+
+# A partir deste nível, contas zeradas são ocultadas; acima dele,
+# a conta só some quando todas as filhas também sumiram.
+NIVEL_MINIMO_OCULTAR_ZERADA = 4
+NIVEL_MINIMO_OCULTAR = 3
+
+
+def marcar_linhas_zeradas(df, colunas_valores):
+    """
+    Máscara das linhas a ocultar em "Ocultar Contas sem Movimento".
+
+    - contas a partir do nível 4 com todas as colunas zeradas e,
+      se tiverem filhas, com todas elas ocultas
+    - contas do nível 3 cujas filhas estão todas ocultas
+
+    A decisão sobe a árvore nível a nível, do mais profundo ao 3,
+    contando filhas e filhas ocultas de cada mãe de uma só vez.
+    """
+
+    colunas = [c for c in colunas_valores if c in df.columns]
+
+    if df.empty or not colunas:
+        return np.zeros(len(df), dtype=bool)
+
+    arvore = obter_arvore_contas(df)
+
+    zerado = (
+        df[colunas]
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0.0)
+        .abs()
+        .sum(axis=1)
+        .to_numpy()
+        == 0
+    )
+
+    oculta = zerado & (arvore.niveis >= NIVEL_MINIMO_OCULTAR_ZERADA)
+
+    total = len(arvore)
+
+    for nivel in sorted(set(arvore.niveis.tolist()), reverse=True):
+        if nivel - 1 < NIVEL_MINIMO_OCULTAR:
+            break
+
+        filhos = np.flatnonzero(
+            (arvore.niveis == nivel) & (arvore.pais >= 0)
+        )
+
+        if not filhos.size:
+            continue
+
+        pais = arvore.pais[filhos]
+
+        quantidade_filhas = np.bincount(pais, minlength=total)
+        filhas_ocultas = np.bincount(
+            pais,
+            weights=oculta[filhos],
+            minlength=total
+        )
+
+        tem_filhas = quantidade_filhas > 0
+        todas_ocultas = tem_filhas & (filhas_ocultas == quantidade_filhas)
+
+        if nivel - 1 >= NIVEL_MINIMO_OCULTAR_ZERADA:
+            # Mãe com lançamento próprio continua visível.
+            oculta = np.where(tem_filhas, zerado & todas_ocultas, oculta)
+        else:
+            oculta |= todas_ocultas
+
+    return oculta
+
+
+def filtrar_linhas_zeradas(df, colunas_valores):
+    """
+    Remove as contas sem movimento e os grupos que ficaram vazios.
+    """
+
+    df = df.copy()
+
+    if df.empty:
+        return df
+
+    return df[~marcar_linhas_zeradas(df, colunas_valores)]
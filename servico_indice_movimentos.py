@@ -0,0 +1,219 @@
+from datetime import datetime, timezone
+
+import pandas as pd
+
+
+# Índice leve de movimentos_financeiros: uma linha por (ano, mês).
+#
+# create table movimentos_indice (
+#     ano integer not null,
+#     mes integer not null,
+#     quantidade integer not null default 0,
+#     centros_custo jsonb not null default '[]'::jsonb,
+#     atualizado_em timestamptz,
+#     digest text,
+#     primary key (ano, mes)
+# );
+
+TABELA_INDICE = "movimentos_indice"
+
+
+def _lista_centros(serie):
+    return sorted(
+        {
+            str(c).strip()
+            for c in serie.dropna().astype(str)
+            if str(c).strip() and str(c).strip().lower() != "nan"
+        }
+    )
+
+
+def resumir_periodo(df_mov_supabase, ano, mes_num, digest=None):
+    """
+    Resume um mês importado (colunas no padrão do Supabase)
+    no registro do índice. `digest` é a impressão digital do
+    conteúdo importado, usada para reconhecer uma carga repetida.
+    """
+
+    centros = []
+
+    if df_mov_supabase is not None and "centro_custo" in df_mov_supabase.columns:
+        centros = _lista_centros(df_mov_supabase["centro_custo"])
+
+    registro = {
+        "ano": int(ano),
+        "mes": int(mes_num),
+        "quantidade": int(len(df_mov_supabase)) if df_mov_supabase is not None else 0,
+        "centros_custo": centros,
+        "atualizado_em": datetime.now(timezone.utc).isoformat(),
+    }
+
+    if digest is not None:
+        registro["digest"] = digest
+
+    return registro
+
+
+def montar_indice(df_mov):
+    """
+    Monta os registros do índice a partir de movimentos já
+    normalizados (Ano, Mes, Centro de Custo).
+    """
+
+    if (
+        df_mov is None
+        or df_mov.empty
+        or "Ano" not in df_mov.columns
+        or "Mes" not in df_mov.columns
+    ):
+        return []
+
+    df = df_mov.dropna(subset=["Ano", "Mes"])
+
+    if "Centro de Custo" not in df.columns:
+        df = df.assign(**{"Centro de Custo": ""})
+
+    registros = []
+
+    for (ano, mes), grupo in df.groupby(["Ano", "Mes"]):
+        registro = resumir_periodo(
+            grupo.rename(columns={"Centro de Custo": "centro_custo"}),
+            ano,
+            mes
+        )
+        registros.append(registro)
+
+    return registros
+
+
+def normalizar_indice(registros):
+    """
+    Converte os registros do índice para o padrão interno do app:
+    Ano, Mes, Quantidade e Centros de Custo (lista).
+    """
+
+    df = pd.DataFrame(registros)
+
+    if df.empty:
+        return pd.DataFrame(
+            columns=["Ano", "Mes", "Quantidade", "Centros de Custo"]
+        )
+
+    df.columns = [str(c).strip().lower() for c in df.columns]
+
+    df = df.rename(columns={
+        "ano": "Ano",
+        "mes": "Mes",
+        "quantidade": "Quantidade",
+        "centros_custo": "Centros de Custo",
+    })
+
+    df["Ano"] = pd.to_numeric(df["Ano"], errors="coerce").astype("Int64")
+    df["Mes"] = pd.to_numeric(df["Mes"], errors="coerce").astype("Int64")
+    df["Quantidade"] = pd.to_numeric(
+        df.get("Quantidade", 0),
+        errors="coerce"
+    ).fillna(0).astype(int)
+
+    if "Centros de Custo" not in df.columns:
+        df["Centros de Custo"] = [[] for _ in range(len(df))]
+
+    df["Centros de Custo"] = df["Centros de Custo"].apply(
+        lambda valor: list(valor) if isinstance(valor, (list, tuple)) else []
+    )
+
+    return df[["Ano", "Mes", "Quantidade", "Centros de Custo"]]
+
+
+def carregar_indice(supabase_client):
+    """
+    Lê o índice inteiro em uma única consulta: são poucas
+    dezenas de linhas, uma por mês importado.
+    """
+
+    resposta = (
+        supabase_client
+        .table(TABELA_INDICE)
+        .select("ano,mes,quantidade,centros_custo")
+        .order("ano")
+        .order("mes")
+        .execute()
+    )
+
+    return normalizar_indice(resposta.data or [])
+
+
+def ler_digest_periodo(supabase_client, ano, mes_num):
+    """
+    Impressão digital gravada na última carga do mês,
+    ou None quando o mês ainda não tem uma.
+    """
+
+    resposta = (
+        supabase_client
+        .table(TABELA_INDICE)
+        .select("digest")
+        .eq("ano", int(ano))
+        .eq("mes", int(mes_num))
+        .limit(1)
+        .execute()
+    )
+
+    registros = resposta.data or []
+
+    return registros[0].get("digest") if registros else None
+
+
+def registrar_periodo(supabase_client, registro):
+    """
+    Grava (ou substitui) a linha do índice de um mês,
+    ou de vários meses quando `registro` é uma lista.
+    """
+
+    (
+        supabase_client
+        .table(TABELA_INDICE)
+        .upsert(
+            registro,
+            on_conflict="ano,mes"
+        )
+        .execute()
+    )
+
+
+def reconstruir_indice(supabase_client, df_mov):
+    """
+    Reconstrói o índice a partir dos movimentos completos.
+    Usado uma única vez, quando o índice ainda está vazio.
+    """
+
+    registros = montar_indice(df_mov)
+
+    if registros:
+        (
+            supabase_client
+            .table(TABELA_INDICE)
+            .upsert(
+                registros,
+                on_conflict="ano,mes"
+            )
+            .execute()
+        )
+
+    return normalizar_indice(registros)
+
+
+def listar_centros_custo(df_indice):
+    if df_indice is None or df_indice.empty or "Centros de Custo" not in df_indice.columns:
+        return []
+
+    centros = set()
+
+    for lista in df_indice["Centros de Custo"]:
+        centros.update(
+            str(c).strip()
+            for c in (lista or [])
+            if str(c).strip()
+        )
+
+    return sorted(centros)
@@ -1,5 +1,6 @@
 import pandas as pd
 
+from servico_hierarquia import consolidar_valores_plano
 from servico_orcamento import MESES_NUMERO_NOME
 
 
@@ -193,6 +194,10 @@ def consolidar_hierarquia(
     - Nível 3 consolida no nível 2
     - Nível 1 representa o RESULTADO
     - O RESULTADO é a soma das contas de nível 2
+    - Conta com filhas recebe o total delas, mesmo que zero
+
+    As despesas já são negativas, portanto
+    RECEITAS + DESPESAS = RESULTADO.
     """
 
     df = df_base.copy()
@@ -214,89 +219,14 @@ def consolidar_hierarquia(
             errors="coerce"
         ).fillna(0.0)
 
-    # =====================================================
-    # NÍVEL 4 -> NÍVEL 3
-    # =====================================================
-    for idx, row in df[
-        df["Nivel"] == 3
-    ].iterrows():
-
-        prefixo = (
-            str(row["Conta"]).strip()
-            + "."
-        )
-
-        filhos = df[
-            (df["Nivel"] == 4)
-            &
-            (
-                df["Conta"]
-                .astype(str)
-                .str.startswith(prefixo)
-            )
-        ]
-
-        if filhos.empty:
-            continue
-
-        for coluna in colunas_valores:
-            df.at[idx, coluna] = (
-                filhos[coluna].sum()
-            )
-
-    # =====================================================
-    # NÍVEL 3 -> NÍVEL 2
-    # =====================================================
-    for idx, row in df[
-        df["Nivel"] == 2
-    ].iterrows():
-
-        prefixo = (
-            str(row["Conta"]).strip()
-            + "."
-        )
-
-        filhos = df[
-            (df["Nivel"] == 3)
-            &
-            (
-                df["Conta"]
-                .astype(str)
-                .str.startswith(prefixo)
-            )
-        ]
-
-        if filhos.empty:
-            continue
-
-        for coluna in colunas_valores:
-            df.at[idx, coluna] = (
-                filhos[coluna].sum()
-            )
-
-    # =====================================================
-    # NÍVEL 1 -> RESULTADO
-    # =====================================================
-    # As despesas já são negativas.
-    # Portanto:
-    #
-    # RECEITAS + DESPESAS = RESULTADO
-    # =====================================================
-
-    df_nivel_2 = df[
-        df["Nivel"] == 2
-    ].copy()
-
-    for idx, _ in df[
-        df["Nivel"] == 1
-    ].iterrows():
-
-        for coluna in colunas_valores:
-            df.at[idx, coluna] = (
-                df_nivel_2[coluna].sum()
-            )
+    return consolidar_valores_plano(
+        df,
+        colunas_valores,
+        somar_lancamento_direto=False,
+        nivel_maximo=4,
+        substituir_sempre=True
+    )
 
-    return df
 
 def montar_comparativo_gerencial(
     df_plano,
@@ -1,6 +1,9 @@
 from datetime import datetime, timezone
 import pandas as pd
 
+from servico_busca_supabase import buscar_todos_keyset
+from servico_esquemas import aplicar_esquema, colunas_select
+
 
 MESES_NUMERO_NOME = {
     1: "Janeiro",
@@ -46,59 +49,31 @@ def carregar_itens_orcamento(
 ):
     """
     Carrega todos os valores mensais de um orçamento,
-    paginando para não ficar limitado aos primeiros
-    1000 registros do Supabase/PostgREST.
+    paginando por id (keyset) para não ficar limitado aos
+    primeiros 1000 registros do Supabase/PostgREST.
     """
 
-    todos = []
-
-    inicio = 0
-    passo = 1000
-
-    while True:
-
-        resposta = (
+    todos = buscar_todos_keyset(
+        lambda: (
             supabase_client
             .table("orcamento_itens")
-            .select("*")
+            .select(colunas_select("orcamento_itens"))
             .eq(
                 "orcamento_id",
                 int(orcamento_id)
             )
-            .order("conta_id")
-            .order("mes")
-            .range(
-                inicio,
-                inicio + passo - 1
-            )
-            .execute()
         )
+    )
 
-        lote = resposta.data or []
-
-        todos.extend(lote)
-
-        if len(lote) < passo:
-            break
-
-        inicio += passo
-
-    return pd.DataFrame(todos)
-    """
-    Carrega os valores mensais de um orçamento.
-    """
+    df = aplicar_esquema(todos, "orcamento_itens")
 
-    resposta = (
-        supabase_client
-        .table("orcamento_itens")
-        .select("*")
-        .eq("orcamento_id", int(orcamento_id))
-        .order("conta_id")
-        .order("mes")
-        .execute()
-    )
+    if df.empty:
+        return df
 
-    return pd.DataFrame(resposta.data or [])
+    return df.sort_values(
+        by=["conta_id", "mes"],
+        kind="stable"
+    ).reset_index(drop=True)
 
 
 def montar_grade_orcamento(
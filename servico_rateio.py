@@ -0,0 +1,398 @@
+import numpy as np
+import pandas as pd
+
+
+# Prefixo da conta → coluna do resultado por centro de custo.
+GRUPOS_CENTRO_CUSTO = {
+    "01": "Receita",
+    "02": "Despesa Direta",
+}
+
+# Bases de distribuição do bolo de rateio entre as obras:
+# - despesa_direta: proporcional à despesa direta de cada obra
+# - receita: proporcional à receita de cada obra
+# - peso: proporcional a pesos informados (ex.: equipe alocada),
+#   vindos do parâmetro `pesos` ou da coluna "Peso" do rateio_config
+#
+# A coluna é opcional: sem ela o app lê e grava o rateio_config
+# normalmente e o driver "peso" só usa o parâmetro `pesos`.
+# alter table rateio_config add column peso numeric;
+DRIVERS_RATEIO = (
+    "despesa_direta",
+    "receita",
+    "peso",
+)
+
+LOGICA_PADRAO = "obra"
+
+
+def resumir_centros_custo(df_movimentos):
+    """
+    Receita e Despesa Direta por centro de custo em um único
+    pivot sobre (Centro de Custo, grupo da conta).
+
+    Centros sem contas 01/02 continuam na tabela, zerados.
+    """
+
+    colunas = ["Centro de Custo"] + list(GRUPOS_CENTRO_CUSTO.values())
+
+    if df_movimentos is None or df_movimentos.empty:
+        return pd.DataFrame(columns=colunas)
+
+    centros = (
+        df_movimentos["Centro de Custo"]
+        .astype(str)
+        .str.strip()
+    )
+
+    grupos = (
+        df_movimentos["Conta_ID"]
+        .astype(str)
+        .str.strip()
+        .str[:2]
+        .map(GRUPOS_CENTRO_CUSTO)
+    )
+
+    valores = pd.to_numeric(
+        df_movimentos["Valor_Final"],
+        errors="coerce"
+    ).fillna(0.0)
+
+    resumo = (
+        valores
+        .groupby([centros, grupos], dropna=False)
+        .sum()
+        .unstack(fill_value=0.0)
+        .reindex(columns=list(GRUPOS_CENTRO_CUSTO.values()), fill_value=0.0)
+        .astype(float)
+    )
+
+    resumo.index.name = "Centro de Custo"
+    resumo.columns.name = None
+
+    return resumo.reset_index()[colunas]
+
+
+def mapear_logica(centros, df_rateio_config=None, logicas=None):
+    """
+    Lógica (obra, rateio ou fora) de cada centro de custo.
+
+    `logicas` ({centro: logica}) tem prioridade sobre o
+    rateio_config; centros sem configuração são tratados como obra.
+    """
+
+    mapa = {}
+
+    if df_rateio_config is not None and not df_rateio_config.empty:
+        mapa.update(
+            zip(
+                df_rateio_config["Centro de Custo"].astype(str).str.strip(),
+                df_rateio_config["Logica"].astype(str).str.lower().str.strip()
+            )
+        )
+
+    if logicas:
+        mapa.update(
+            {
+                str(centro).strip(): str(logica).lower().strip()
+                for centro, logica in logicas.items()
+            }
+        )
+
+    return (
+        pd.Series(centros, dtype=object)
+        .astype(str)
+        .str.strip()
+        .map(mapa)
+        .fillna(LOGICA_PADRAO)
+        .to_numpy()
+    )
+
+
+def _pesos_configurados(centros, df_rateio_config=None, pesos=None):
+    mapa = {}
+
+    if (
+        df_rateio_config is not None
+        and not df_rateio_config.empty
+        and "Peso" in df_rateio_config.columns
+    ):
+        mapa.update(
+            zip(
+                df_rateio_config["Centro de Custo"].astype(str).str.strip(),
+                pd.to_numeric(df_rateio_config["Peso"], errors="coerce")
+            )
+        )
+
+    if pesos is not None:
+        mapa.update(
+            {str(centro).strip(): valor for centro, valor in dict(pesos).items()}
+        )
+
+    return (
+        pd.Series(centros, dtype=object)
+        .astype(str)
+        .str.strip()
+        .map(mapa)
+        .pipe(pd.to_numeric, errors="coerce")
+        .fillna(0.0)
+        .to_numpy(dtype=float)
+    )
+
+
+def base_driver(
+    resumo,
+    driver="despesa_direta",
+    df_rateio_config=None,
+    pesos=None
+):
+    """
+    Valor de cada centro na base de distribuição escolhida,
+    antes de considerar quem recebe rateio.
+    """
+
+    if driver == "despesa_direta":
+        return resumo["Despesa Direta"].to_numpy(dtype=float)
+
+    if driver == "receita":
+        return resumo["Receita"].to_numpy(dtype=float)
+
+    if driver == "peso":
+        return _pesos_configurados(
+            resumo["Centro de Custo"],
+            df_rateio_config,
+            pesos
+        )
+
+    raise ValueError(
+        f"Driver de rateio inválido: {driver}. "
+        f"Use um de {', '.join(DRIVERS_RATEIO)}."
+    )
+
+
+def distribuir_rateio(despesas, logicas, bases):
+    """
+    Distribui o bolo de rateio de cada cenário entre as obras.
+
+    despesas: (centros,) despesa direta de cada centro
+    logicas:  (centros, cenarios) lógica de cada centro por cenário
+    bases:    (centros, cenarios) base de distribuição por cenário
+
+    O bolo de cada cenário é a despesa dos centros "rateio";
+    recebem as obras com base diferente de zero, na proporção da base.
+    Devolve a matriz (centros, cenarios) de rateio recebido.
+    """
+
+    despesas = np.asarray(despesas, dtype=float).reshape(-1, 1)
+    logicas = np.asarray(logicas, dtype=object)
+    bases = np.asarray(bases, dtype=float)
+
+    bolos = np.where(logicas == "rateio", despesas, 0.0).sum(axis=0)
+
+    receptores = np.where(
+        (logicas == LOGICA_PADRAO) & (bases != 0),
+        bases,
+        0.0
+    )
+
+    totais = receptores.sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        proporcoes = np.where(
+            totais != 0,
+            receptores / totais,
+            0.0
+        )
+
+    return proporcoes * bolos
+
+
+def classificar_status(resultado, margem):
+    """
+    Crítico para resultado negativo, Atenção para margem
+    abaixo de 10% e Saudável nos demais casos.
+    """
+
+    return np.select(
+        [
+            np.asarray(resultado) < 0,
+            np.asarray(margem) < 10,
+        ],
+        [
+            "Crítico",
+            "Atenção",
+        ],
+        default="Saudável"
+    )
+
+
+def calcular_margem(resultado, receita):
+    resultado = np.asarray(resultado, dtype=float)
+    receita = np.asarray(receita, dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            receita != 0,
+            resultado / receita * 100,
+            0.0
+        )
+
+
+def calcular_resultado_centros(
+    df_movimentos,
+    df_rateio_config=None,
+    usar_rateio=False,
+    driver="despesa_direta",
+    pesos=None
+):
+    """
+    Receita, Despesa Direta, Logica, Rateio Estrutura, Resultado,
+    Margem % e Status de todos os centros de custo.
+    """
+
+    resumo = resumir_centros_custo(df_movimentos)
+
+    resumo["Logica"] = mapear_logica(
+        resumo["Centro de Custo"],
+        df_rateio_config
+    )
+
+    resumo["Rateio Estrutura"] = 0.0
+
+    if usar_rateio and not resumo.empty:
+        resumo["Rateio Estrutura"] = distribuir_rateio(
+            resumo["Despesa Direta"],
+            resumo[["Logica"]],
+            base_driver(
+                resumo,
+                driver,
+                df_rateio_config,
+                pesos
+            ).reshape(-1, 1)
+        )[:, 0]
+
+    resumo["Resultado"] = (
+        resumo["Receita"]
+        + resumo["Despesa Direta"]
+        + resumo["Rateio Estrutura"]
+    )
+
+    resumo["Margem %"] = calcular_margem(
+        resumo["Resultado"],
+        resumo["Receita"]
+    )
+
+    resumo["Status"] = classificar_status(
+        resumo["Resultado"],
+        resumo["Margem %"]
+    )
+
+    return resumo
+
+
+def distribuir_proporcionalmente(base, valor):
+    """
+    Reparte `valor` entre os itens de `base` (Series) na
+    proporção de cada um. Base zerada não recebe nada.
+    """
+
+    total = base.sum()
+
+    if base.empty or total == 0:
+        return pd.Series(0.0, index=base.index)
+
+    return base / total * valor
+
+
+def simular_cenarios_rateio(
+    df_movimentos,
+    cenarios,
+    df_rateio_config=None
+):
+    """
+    Avalia vários cenários de rateio de uma só vez, sem gravar nada.
+
+    cenarios: lista de dicionários com
+    - "nome": rótulo do cenário
+    - "driver": base de distribuição (DRIVERS_RATEIO), padrão despesa_direta
+    - "logicas": {centro: logica} que sobrepõe o rateio_config
+    - "pesos": {centro: peso} para o driver "peso"
+
+    Os totais por centro são calculados uma única vez; lógicas e bases
+    de cada cenário viram colunas de matrizes (centros × cenários) e o
+    rateio de todos os cenários sai de uma só distribuição.
+
+    Devolve uma linha por (Cenário, Centro de Custo) com Logica,
+    Rateio Estrutura, Resultado, Margem % e Status.
+    """
+
+    colunas = [
+        "Cenário",
+        "Centro de Custo",
+        "Logica",
+        "Receita",
+        "Despesa Direta",
+        "Rateio Estrutura",
+        "Resultado",
+        "Margem %",
+        "Status",
+    ]
+
+    resumo = resumir_centros_custo(df_movimentos)
+    cenarios = list(cenarios)
+
+    if resumo.empty or not cenarios:
+        return pd.DataFrame(columns=colunas)
+
+    nomes = [
+        str(cenario.get("nome") or f"Cenário {i + 1}")
+        for i, cenario in enumerate(cenarios)
+    ]
+
+    logicas = np.column_stack([
+        mapear_logica(
+            resumo["Centro de Custo"],
+            df_rateio_config,
+            cenario.get("logicas")
+        )
+        for cenario in cenarios
+    ])
+
+    bases = np.column_stack([
+        base_driver(
+            resumo,
+            cenario.get("driver", "despesa_direta"),
+            df_rateio_config,
+            cenario.get("pesos")
+        )
+        for cenario in cenarios
+    ])
+
+    receita = resumo["Receita"].to_numpy(dtype=float).reshape(-1, 1)
+    despesa = resumo["Despesa Direta"].to_numpy(dtype=float).reshape(-1, 1)
+
+    rateio = distribuir_rateio(despesa, logicas, bases)
+    resultado = receita + despesa + rateio
+    margem = calcular_margem(resultado, np.broadcast_to(receita, resultado.shape))
+
+    quantidade_centros, quantidade_cenarios = resultado.shape
+
+    # Matrizes em ordem de coluna: todos os centros do 1º cenário,
+    # depois todos do 2º, e assim por diante.
+    def achatar(matriz):
+        return np.asarray(matriz).ravel(order="F")
+
+    return pd.DataFrame({
+        "Cenário": np.repeat(nomes, quantidade_centros),
+        "Centro de Custo": np.tile(
+            resumo["Centro de Custo"].to_numpy(),
+            quantidade_cenarios
+        ),
+        "Logica": achatar(logicas),
+        "Receita": achatar(np.broadcast_to(receita, resultado.shape)),
+        "Despesa Direta": achatar(np.broadcast_to(despesa, resultado.shape)),
+        "Rateio Estrutura": achatar(rateio),
+        "Resultado": achatar(resultado),
+        "Margem %": achatar(margem),
+        "Status": classificar_status(achatar(resultado), achatar(margem)),
+    })[colunas]
@@ -0,0 +1,111 @@
+import pandas as pd
+
+
+def descrever_linhas(numeros, limite=10):
+    """
+    "2, 5, 9 e mais 3": números de linha do Excel para mensagens.
+    """
+
+    numeros = [str(n) for n in numeros]
+    texto = ", ".join(numeros[:limite])
+
+    if len(numeros) > limite:
+        texto += f" e mais {len(numeros) - limite}"
+
+    return texto
+
+
+def _indice_codigos(valores):
+    if valores is None:
+        return pd.Index([], dtype=object)
+
+    return pd.Index(
+        pd.Series(valores, dtype=object)
+        .dropna()
+        .astype(str)
+        .str.strip()
+        .unique()
+    ).sort_values()
+
+
+class ReferenciaImportacao:
+    """
+    Contas do plano e centros de custo do rateio_config, lidos uma
+    única vez por importação e guardados como índices ordenados.
+
+    Todas as validações da carga (um mês ou vários) consultam a
+    mesma referência, sem voltar ao banco; centros cadastrados
+    durante a carga entram com registrar_centros().
+    """
+
+    def __init__(self, df_plano=None, df_rateio=None):
+        self.contas = _indice_codigos(
+            None if df_plano is None or df_plano.empty else df_plano["Conta"]
+        )
+        self.centros = _indice_codigos(
+            None if df_rateio is None or df_rateio.empty else df_rateio["Centro de Custo"]
+        )
+
+    def registrar_centros(self, centros):
+        self.centros = self.centros.union(_indice_codigos(centros))
+
+    @staticmethod
+    def _faltantes(codigos, referencia, coluna):
+        """
+        Códigos de `codigos` ausentes em `referencia`, com a
+        quantidade de lançamentos e as linhas do Excel de cada um.
+
+        O isin é feito só sobre os códigos distintos; o resultado
+        volta às linhas pelos códigos fatorados.
+        """
+
+        colunas = [coluna, "Lançamentos", "Linhas"]
+
+        if codigos is None or codigos.empty:
+            return pd.DataFrame(columns=colunas)
+
+        codigos = codigos.astype(str).str.strip()
+        posicoes, distintos = pd.factorize(codigos, sort=True)
+        ausentes = ~distintos.isin(referencia)
+
+        if not ausentes.any():
+            return pd.DataFrame(columns=colunas)
+
+        linhas_ausentes = ausentes[posicoes]
+
+        linhas = (
+            pd.Series(codigos.index[linhas_ausentes])
+            .groupby(codigos.to_numpy()[linhas_ausentes], sort=True)
+            .agg(list)
+        )
+
+        return pd.DataFrame({
+            coluna: linhas.index,
+            "Lançamentos": linhas.map(len).to_numpy(),
+            "Linhas": linhas.map(descrever_linhas).to_numpy(),
+        })
+
+    def contas_faltantes(self, df_mov_supabase):
+        return self._faltantes(
+            df_mov_supabase.get("conta_id"),
+            self.contas,
+            "conta_id"
+        )
+
+    def centros_faltantes(self, df_mov_supabase):
+        return self._faltantes(
+            df_mov_supabase.get("centro_custo"),
+            self.centros,
+            "centro_custo"
+        )
+
+    def validar(self, df_mov_supabase):
+        """
+        (contas_faltantes, centros_faltantes), cada um um DataFrame
+        com o código, a quantidade de lançamentos e as linhas do Excel.
+        """
+
+        return (
+            self.contas_faltantes(df_mov_supabase),
+            self.centros_faltantes(df_mov_supabase),
+        )